@@ -75,10 +75,39 @@ WSGI_APPLICATION = "media_log.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Copy of the database read by the analytics views, refreshed with
+# `manage.py backup_db --refresh-snapshot`. Without it they read the live file.
+SNAPSHOT_PATH = os.environ.get("MEDIA_LOG_SNAPSHOT")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+    },
+    # Read-only connection for the heavy analytics reads, see read.routers
+    "snapshot": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": Path(SNAPSHOT_PATH or BASE_DIR / "db.sqlite3").resolve().as_uri()
+        + "?mode=ro",
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["read.routers.AnalyticsRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The cached analytics, reading paces and admin facets are invalidated by
+# bumping version keys. The cache has to be shared by the web workers,
+# run_tasks and the management commands for a save in one of them to reach
+# the others, which the default per-process memory cache is not.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
 }
 
@@ -126,3 +155,23 @@ STATIC_ROOT = BASE_DIR / "collect_static"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 APPEND_SLASH = True
+
+# Reading logs of readings finished more than this many days ago are compacted
+# into one log per day by `manage.py compact_reading_logs`, None disables it
+READ_LOG_RETENTION_DAYS = None
+
+# Let the admin changelists of the large tables take their unfiltered row
+# count from the statistics of the last ANALYZE instead of COUNT(*). Rows
+# added since the ANALYZE are on pages past the estimate the links miss.
+READ_ESTIMATED_COUNTS = False
+
+# Directory of the snapshots taken by `manage.py backup_db`
+BACKUP_DIR = BASE_DIR / "backups"
+
+# Background jobs, see read.tasks. By default they run inline, in the request
+# that queues them. Turn on READ_TASKS_AUTOSTART to have each web process start
+# a worker thread on its first request, or set READ_TASKS_EAGER to False when
+# `manage.py run_tasks` runs next to the web server.
+READ_TASKS_AUTOSTART = False
+READ_TASKS_EAGER = None
+READ_TASKS_THREADS = 1
@@ -0,0 +1,22 @@
+"""
+Settings for serving media_log over ASGI, see media_log/asgi.py.
+
+The async read endpoints run on the event loop while the sync views and the
+writes go through Django's thread pool. WAL lets those readers and the single
+writer use the SQLite file at the same time.
+"""
+
+from .settings import *
+
+DATABASES["default"]["OPTIONS"] = {
+    # WAL is stored in the file, the other pragmas are per connection
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA busy_timeout=5000;"
+    ),
+    # take the write lock when the transaction starts rather than failing
+    # with "database is locked" when a reader upgrades to a writer
+    "transaction_mode": "IMMEDIATE",
+}
+DATABASES["snapshot"]["OPTIONS"] = {"init_command": "PRAGMA busy_timeout=5000;"}
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "media_log.settings")
 
 application = get_wsgi_application()
+
+if os.environ.get("MEDIA_LOG_WARMUP"):
+    # load templates, URLs, the database and the dashboard caches before the
+    # first request, see read/warmup.py
+    from read.warmup import warm_up
+
+    warm_up()
@@ -1,20 +1,63 @@
-from django.contrib import admin
-from django.db.models import Count
-from django.forms import ValidationError
+from datetime import datetime
+from urllib.parse import urlencode
 
+from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.forms import BaseInlineFormSet, ValidationError
+from django.shortcuts import get_object_or_404, render
+from django.urls import path, reverse
+
+from . import search
+from .filters import (
+    CachedAllValuesFieldListFilter,
+    CachedDateFieldListFilter,
+    CachedRelatedFieldListFilter,
+)
+from .pagination import (
+    EstimatedCountPaginator,
+    decode_cursor,
+    encode_cursor,
+    rows_before,
+)
 from .models import (
     Author,
     Book,
     Edition,
     Genre,
     Award,
+    Job,
     Reading,
+    ReadingGoal,
     ReadingLog,
+    Recommendation,
     Series,
     BookAward,
+    YearInReview,
+    YearlyProgress,
 )
 
 
+class SearchIndexMixin:
+    """Answer the changelist and autocomplete searches from the full-text index.
+
+    ``search_index`` is the kind of row to match and ``search_index_lookup``
+    the lookup relating the admin's model to it.
+    """
+
+    search_index = None
+    search_index_lookup = "pk__in"
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip() or not search.enabled():
+            return super().get_search_results(request, queryset, search_term)
+        if not search.match_expression(search_term):
+            return queryset.none(), False
+        ids = search.matching_ids(self.search_index, search_term)
+        return queryset.filter(**{self.search_index_lookup: ids}), False
+
+
 class BookAwardInline(admin.TabularInline):
     model = BookAward
     extra = 0
@@ -57,7 +100,7 @@ class EditionsInLine(admin.TabularInline):
 
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(SearchIndexMixin, admin.ModelAdmin):
     model = Book
     fields = (
         "title",
@@ -82,20 +125,38 @@ class BookAdmin(admin.ModelAdmin):
     )
 
     readonly_fields = ("status", "get_rating")
+    list_select_related = ("author",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [BookAwardInline, EditionsInLine]
     autocomplete_fields = ["genres", "author"]
     search_fields = ("title",)
+    search_index = "book"
     list_filter = (
-        "author",
-        "language",
-        "genres",
-        "publish_year",
+        ("author", CachedRelatedFieldListFilter),
+        ("language", CachedAllValuesFieldListFilter),
+        ("genres", CachedRelatedFieldListFilter),
+        ("publish_year", CachedAllValuesFieldListFilter),
     )
+    show_facets = admin.ShowFacets.ALWAYS
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        editions = Edition.objects.filter(title=OuterRef("pk"))
+        return queryset.annotate(
+            in_progress=Exists(editions.filter(status="P")),
+            finished=Exists(editions.filter(status="F")),
+        )
 
     # display a property in admin
     @admin.display(description="Status")
     def status_display(self, obj):
-        return obj.status
+        # same as Book.status, from the annotations instead of two queries per row
+        if obj.in_progress:
+            return "In Progress"
+        if obj.finished:
+            return "Finished"
+        return "Want to read"
 
     @admin.display(description="Rating")
     def get_rating(self, obj):
@@ -103,16 +164,17 @@ class BookAdmin(admin.ModelAdmin):
 
 
 @admin.register(Author)
-class AuthorAdmin(admin.ModelAdmin):
+class AuthorAdmin(SearchIndexMixin, admin.ModelAdmin):
     model = Author
     fields = ("name", "country", "nobel")
     list_display = ("name", "country", "nobel")
     inlines = [BookInlineForAuthor]
     search_fields = ("name",)
+    search_index = "author"
 
 
 @admin.register(Edition)
-class EditionAdmin(admin.ModelAdmin):
+class EditionAdmin(SearchIndexMixin, admin.ModelAdmin):
     fields = (
         "title",
         "subtitle",
@@ -132,8 +194,13 @@ class EditionAdmin(admin.ModelAdmin):
         "get_rating",
     )
     inlines = [ReadingInLine]
+    list_select_related = ("title__author",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     autocomplete_fields = ("title",)
     list_filter = ("format", "status", "language")
+    search_fields = ("title__title", "subtitle", "isbn")
+    search_index = "edition"
     readonly_fields = ("get_rating",)
 
     @admin.display(description="Author")
@@ -169,8 +236,48 @@ class GenreAdmin(admin.ModelAdmin):
         return queryset.annotate(book_count=Count("book"))
 
 
+class RecentLogsFormSet(BaseInlineFormSet):
+    """Only the most recent logs of a reading, older ones are loaded on demand"""
+
+    recent_count = 20
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            queryset = super().get_queryset().order_by("-date", "-pk")
+            if self.is_bound:
+                # the rows the form was rendered with, a log added since then
+                # would shift a re-sliced window away from them
+                self._queryset = queryset.filter(pk__in=self.submitted_pks())
+            else:
+                self._queryset = queryset[: self.recent_count]
+        return self._queryset
+
+    def submitted_pks(self):
+        pk_name = self.model._meta.pk.name
+        values = (
+            self.data.get(f"{self.add_prefix(i)}-{pk_name}")
+            for i in range(self.initial_form_count())
+        )
+        return [int(value) for value in values if value and value.isdigit()]
+
+    @property
+    def older_logs_url(self):
+        logs = list(self.get_queryset())
+        if len(logs) < self.recent_count:
+            return None
+        oldest = logs[-1]
+        if not rows_before(
+            self.instance.logs.all(), "date", oldest.date, oldest.pk
+        ).exists():
+            return None
+        url = reverse("admin:read_reading_older_logs", args=[self.instance.pk])
+        return f"{url}?{urlencode({'cursor': encode_cursor(oldest.date, oldest.pk)})}"
+
+
 class ReadingLogInline(admin.TabularInline):
     model = ReadingLog
+    formset = RecentLogsFormSet
+    template = "admin/read/reading/recent_logs_inline.html"
     extra = 0
     fields = ("date", "pages_read", "percentage_read")
 
@@ -181,7 +288,7 @@ class ReadingLogInline(admin.TabularInline):
 
 
 @admin.register(Reading)
-class ReadingAdmin(admin.ModelAdmin):
+class ReadingAdmin(SearchIndexMixin, admin.ModelAdmin):
     fields = (
         "edition",
         "current_status",
@@ -205,17 +312,127 @@ class ReadingAdmin(admin.ModelAdmin):
         "date_finished",
     )
     inlines = [ReadingLogInline]
-    search_fields = ("edition",)
+    list_select_related = ("edition__title",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_fields = ("edition__title__title",)
+    search_index = "edition"
+    search_index_lookup = "edition__in"
     readonly_fields = ("percentage_complete",)
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        latest_log = ReadingLog.objects.filter(reading=OuterRef("pk")).order_by("-date")
+        return queryset.annotate(
+            latest_percentage_read=Subquery(latest_log.values("percentage_read")[:1]),
+            latest_computed_pages=Subquery(latest_log.values("computed_pages")[:1]),
+            latest_page_count=Subquery(latest_log.values("resolved_page_count")[:1]),
+        )
+
+    older_logs_page_size = 50
+
+    def get_urls(self):
+        return [
+            path(
+                "<path:object_id>/older-logs/",
+                self.admin_site.admin_view(self.older_logs_view),
+                name="read_reading_older_logs",
+            ),
+            *super().get_urls(),
+        ]
+
+    def older_logs_view(self, request, object_id):
+        """HTMX partial with the logs older than the cursor"""
+        reading = get_object_or_404(Reading, pk=object_id)
+        if not self.has_view_permission(request, reading):
+            raise PermissionDenied
+        logs = reading.logs.order_by("-date", "-pk")
+        cursor = decode_cursor(request.GET.get("cursor"), datetime.fromisoformat, int)
+        if cursor:
+            logs = rows_before(logs, "date", *cursor)
+        logs = list(logs[: self.older_logs_page_size + 1])
+        next_url = None
+        if len(logs) > self.older_logs_page_size:
+            logs = logs[: self.older_logs_page_size]
+            cursor = encode_cursor(logs[-1].date, logs[-1].pk)
+            next_url = f"{request.path}?{urlencode({'cursor': cursor})}"
+        return render(
+            request,
+            "admin/read/reading/older_logs.html",
+            {"logs": logs, "next_url": next_url},
+        )
+
     @admin.display(description="Percentage Complete")
     def percentage_complete(self, obj):
-        return obj.percentage_complete
+        # same rule as Reading.percentage_complete, from the annotated latest log
+        if obj.latest_percentage_read is not None:
+            return obj.latest_percentage_read
+        if obj.latest_computed_pages:
+            return int(obj.latest_computed_pages / obj.latest_page_count * 100)
+        return 0
+
+
+class KeysetChangeList(ChangeList):
+    """Changelist paged with a (date, id) cursor instead of page numbers.
+
+    Used while the default newest-first ordering is kept: every page is an
+    indexed range scan and no COUNT(*) of the table is needed. Sorting by a
+    column falls back to the regular paginator.
+    """
+
+    CURSOR_VAR = "cursor"
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(self.CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # links to filters, searches and sortings restart from the first page
+        new_params = new_params or {}
+        if self.CURSOR_VAR not in new_params:
+            remove = [*(remove or []), self.CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        self.keyset = ORDER_VAR not in self.params and not self.show_all
+        if not self.keyset:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        cursor = decode_cursor(
+            self.params.get(self.CURSOR_VAR), datetime.fromisoformat, int
+        )
+        if cursor:
+            queryset = rows_before(queryset, "date", *cursor)
+        rows = list(queryset[: self.list_per_page + 1])
+        self.result_list = rows[: self.list_per_page]
+        self.next_url = None
+        if len(rows) > self.list_per_page:
+            last = self.result_list[-1]
+            self.next_url = self.get_query_string(
+                {self.CURSOR_VAR: encode_cursor(last.date, last.pk)}
+            )
+        self.first_url = self.get_query_string() if cursor else None
+
+        self.result_count = len(self.result_list)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
 
 
 @admin.register(ReadingLog)
 class ReadingLogAdmin(admin.ModelAdmin):
     list_display = ("reading", "date", "pages_read", "percentage_read")
+    list_select_related = ("reading__edition__title",)
+    ordering = ("-date", "-id")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fields = (
         "reading",
         "date",
@@ -230,13 +447,18 @@ class ReadingLogAdmin(admin.ModelAdmin):
         "computed_pages",
         "page_difference",
     )
-    list_filter = ("date",)
+    list_filter = (("date", CachedDateFieldListFilter),)
+    show_facets = admin.ShowFacets.ALWAYS
     autocomplete_fields = ("reading",)
 
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
 
 @admin.register(Series)
 class SeriesAdmin(admin.ModelAdmin):
     list_display = ("title", "author", "get_number_of_volumes")
+    list_select_related = ("author",)
     fields = ("title", "author")
     inlines = [BookInlineForSeries]
 
@@ -253,6 +475,7 @@ class SeriesAdmin(admin.ModelAdmin):
 @admin.register(BookAward)
 class BookAwardAdmin(admin.ModelAdmin):
     list_display = ("book", "prize", "year", "status")
+    list_select_related = ("book", "prize")
     fields = ("book", "prize", "year", "status")
     autocomplete_fields = ("book",)
     list_filter = (
@@ -260,3 +483,60 @@ class BookAwardAdmin(admin.ModelAdmin):
         "status",
         "year",
     )
+
+
+@admin.register(ReadingGoal)
+class ReadingGoalAdmin(admin.ModelAdmin):
+    list_display = ("year", "pages_target", "books_target", "get_pages_per_day")
+    fields = ("year", "pages_target", "books_target")
+
+    @admin.display(description="Pages/day needed")
+    def get_pages_per_day(self, obj):
+        return obj.required_pace()["pages_per_day"]
+
+
+@admin.register(YearlyProgress)
+class YearlyProgressAdmin(admin.ModelAdmin):
+    list_display = ("year", "pages_read", "books_finished")
+    readonly_fields = ("year", "pages_read", "books_finished")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("key", "status", "attempts", "created_at", "started_at")
+    list_filter = ("status", "name")
+    readonly_fields = (
+        "name",
+        "key",
+        "arguments",
+        "status",
+        "attempts",
+        "error",
+        "created_at",
+        "started_at",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(YearInReview)
+class YearInReviewAdmin(admin.ModelAdmin):
+    list_display = ("year", "is_final", "generated_at")
+    readonly_fields = ("year", "data", "html", "generated_at", "is_final")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Recommendation)
+class RecommendationAdmin(admin.ModelAdmin):
+    list_display = ("rank", "edition", "score", "generated_at")
+    list_select_related = ("edition__title",)
+    readonly_fields = ("rank", "edition", "score", "generated_at")
+
+    def has_add_permission(self, request):
+        return False
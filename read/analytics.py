@@ -0,0 +1,210 @@
+"""Columnar analytics over the reading log.
+
+All logs are loaded once, joined to their reading, edition, book and genres,
+into NumPy arrays. Every statistic is then a handful of vectorized group-bys
+instead of Python loops over model instances. The arrays are kept in memory
+until any of the underlying tables change, which bumps a version in the
+shared cache so every process notices.
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.functions import TruncDate
+
+from read.models import Edition, ReadingLog
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VERSION_KEY = "read:analytics:version"
+SPEED_DIMENSIONS = ("format", "language", "author")
+
+_lock = threading.Lock()
+_columns = None
+
+
+def data_version():
+    # a culled or cleared key starts over from the clock, never from a
+    # version an older copy of the columns could still carry
+    return cache.get_or_set(VERSION_KEY, time.time_ns, None)
+
+
+def invalidate_analytics():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+class LogColumns:
+    """One row per (log, genre) pair, books without genres get a single row"""
+
+    def __init__(self, rows, version):
+        self.version = version
+        (
+            log_id,
+            day,
+            pages,
+            reading,
+            status,
+            edition_format,
+            edition_language,
+            book_language,
+            author,
+            author_name,
+            series,
+            series_title,
+            genre,
+            genre_name,
+        ) = (
+            zip(*rows) if rows else ([],) * 14
+        )
+
+        self.size = len(log_id)
+        self.log_id = np.array(log_id, dtype=np.int64)
+        self.pages = np.array(pages, dtype=np.int64)
+        self.reading = np.array(reading, dtype=np.int64)
+        self.finished = np.array(status, dtype=object) == "F"
+        self.day = np.array([d.toordinal() for d in day], dtype=np.int64)
+        self.month = np.array([d.year * 12 + d.month - 1 for d in day], dtype=np.int64)
+        self.author = np.array(author, dtype=np.int64)
+        self.series = np.array([s or -1 for s in series], dtype=np.int64)
+        self.genre = np.array([g or -1 for g in genre], dtype=np.int64)
+
+        # the first row of every log, used to count each log once
+        self.first = np.ones(self.size, dtype=bool)
+        self.first[1:] = self.log_id[1:] != self.log_id[:-1]
+
+        self.format_labels, self.format = _encode(edition_format)
+        self.language_labels, self.language = _encode(
+            [e or b for e, b in zip(edition_language, book_language)]
+        )
+        self.author_names = _labels(self.author, author_name)
+        self.series_titles = _labels(self.series, series_title)
+        self.genre_names = _labels(self.genre, genre_name)
+
+
+def _encode(values):
+    labels, codes = np.unique(
+        np.array([value or "" for value in values], dtype=str), return_inverse=True
+    )
+    return labels, codes
+
+
+def _labels(ids, names):
+    unique_ids, index = np.unique(ids, return_index=True)
+    return {int(i): names[j] for i, j in zip(unique_ids, index)}
+
+
+def load_columns():
+    global _columns
+    if np is None:
+        raise ImproperlyConfigured(
+            "The reading analytics need NumPy, install media-log[analytics]"
+        )
+    version = data_version()
+    with _lock:
+        if _columns is None or _columns.version != version:
+            rows = list(
+                ReadingLog.objects.annotate(day=TruncDate("date"))
+                .order_by("id")
+                .values_list(
+                    "id",
+                    "day",
+                    "page_difference",
+                    "reading_id",
+                    "reading__current_status",
+                    "reading__edition__format",
+                    "reading__edition__language",
+                    "reading__edition__title__language",
+                    "reading__edition__title__author_id",
+                    "reading__edition__title__author__name",
+                    "reading__edition__title__series_id",
+                    "reading__edition__title__series__title",
+                    "reading__edition__title__genres__id",
+                    "reading__edition__title__genres__name",
+                )
+            )
+            _columns = LogColumns(rows, version)
+        return _columns
+
+
+def _group_sum(keys, weights):
+    """Return the unique rows of ``keys`` and the sum of ``weights`` per row"""
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return unique, np.bincount(inverse.ravel(), weights, minlength=len(unique))
+
+
+def pages_per_genre_per_month():
+    columns = load_columns()
+    mask = (columns.pages > 0) & (columns.genre >= 0)
+    if not mask.any():
+        return []
+    keys = np.stack([columns.genre[mask], columns.month[mask]], axis=1)
+    groups, pages = _group_sum(keys, columns.pages[mask])
+    return [
+        {
+            "genre": columns.genre_names[int(genre)],
+            "month": f"{month // 12}-{month % 12 + 1:02d}",
+            "pages": int(total),
+        }
+        for (genre, month), total in zip(groups, pages)
+    ]
+
+
+def reading_speed(dimension):
+    """Pages per reading day, grouped by edition format, language or author"""
+    if dimension not in SPEED_DIMENSIONS:
+        raise ValueError(f"Unknown dimension {dimension!r}")
+    columns = load_columns()
+    mask = columns.first & (columns.pages > 0)
+    if not mask.any():
+        return []
+    key = getattr(columns, dimension)[mask]
+    groups, pages = _group_sum(key, columns.pages[mask])
+
+    # a reading day is a distinct (reading, day) pair with some progress
+    reading_days = np.unique(
+        np.stack([key, columns.reading[mask], columns.day[mask]], axis=1), axis=0
+    )
+    _, days = _group_sum(reading_days[:, 0], None)
+
+    labels = {
+        "format": lambda code: Edition.FORMATS.get(columns.format_labels[code]),
+        "language": lambda code: columns.language_labels[code] or "Unknown",
+        "author": lambda code: columns.author_names[code],
+    }[dimension]
+    return [
+        {
+            dimension: str(labels(int(group))),
+            "pages": int(total),
+            "reading_days": int(day_count),
+            "pages_per_day": round(total / day_count, 1),
+        }
+        for group, total, day_count in zip(groups, pages, days)
+    ]
+
+
+def series_finish_rate():
+    columns = load_columns()
+    mask = columns.first & (columns.series >= 0)
+    if not mask.any():
+        return []
+    readings, index = np.unique(columns.reading[mask], return_index=True)
+    series = columns.series[mask][index]
+    groups, finished = _group_sum(series, columns.finished[mask][index])
+    _, started = _group_sum(series, None)
+    return [
+        {
+            "series": columns.series_titles[int(group)],
+            "readings": int(total),
+            "finished": int(done),
+            "finish_rate": round(done / total, 2),
+        }
+        for group, total, done in zip(groups, started, finished)
+    ]
@@ -6,4 +6,11 @@ class ReadConfig(AppConfig):
     name = "read"
 
     def ready(self):
-        import read.signals
\ No newline at end of file
+        import read.signals
+        from django.conf import settings
+        from django.core.signals import request_started
+
+        if getattr(settings, "READ_TASKS_AUTOSTART", False):
+            from read.tasks import start_worker_on_first_request
+
+            request_started.connect(start_worker_on_first_request)
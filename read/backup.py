@@ -0,0 +1,89 @@
+"""Online snapshots of the SQLite database through the sqlite3 backup API"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.db import connections
+
+PAGES_PER_STEP = 256
+STEP_SLEEP = 0.05
+SNAPSHOT_SUFFIX = ".sqlite3"
+
+
+def snapshot(destination, using="default", pages=PAGES_PER_STEP, sleep=STEP_SLEEP):
+    """Copy the live database to ``destination`` ``pages`` pages at a time.
+
+    The source is only locked while a step is copied, writers get to run during
+    the ``sleep`` between steps. The copy is written next to the destination and
+    renamed once complete, so a crash never leaves a truncated snapshot behind.
+    The copy is switched out of WAL mode, so it is one self-contained file.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        raise ValueError("Online snapshots need an SQLite database")
+    destination = Path(destination)
+    partial = destination.with_name(destination.name + ".partial")
+    connection.ensure_connection()
+    target = sqlite3.connect(partial)
+    try:
+        connection.connection.backup(target, pages=pages, sleep=sleep)
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+    os.replace(partial, destination)
+    return destination
+
+
+def integrity_errors(path):
+    """Problems reported by PRAGMA integrity_check, empty for a sound file"""
+    path = Path(path)
+    if path.suffix == ".gz":
+        with tempfile.TemporaryDirectory() as directory:
+            plain = Path(directory) / path.stem
+            with gzip.open(path, "rb") as source, open(plain, "wb") as target:
+                shutil.copyfileobj(source, target)
+            return integrity_errors(plain)
+    if not path.is_file():
+        return [f"{path} does not exist"]
+    database = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        rows = database.execute("PRAGMA integrity_check").fetchall()
+    except sqlite3.DatabaseError as error:
+        return [str(error)]
+    finally:
+        database.close()
+    return [] if rows == [("ok",)] else [row[0] for row in rows]
+
+
+def compress(path):
+    """Gzip ``path`` in place, return the path of the compressed file"""
+    path = Path(path)
+    compressed = path.with_name(path.name + ".gz")
+    with open(path, "rb") as source, gzip.open(compressed, "wb") as target:
+        shutil.copyfileobj(source, target)
+    path.unlink()
+    return compressed
+
+
+def snapshots(directory, prefix):
+    """Snapshots taken by the backup command, oldest first"""
+    return sorted(
+        path
+        for path in Path(directory).glob(f"{prefix}-*")
+        if path.name.endswith((SNAPSHOT_SUFFIX, f"{SNAPSHOT_SUFFIX}.gz"))
+    )
+
+
+def rotate(directory, prefix, keep):
+    """Delete all but the ``keep`` newest snapshots, return the deleted paths"""
+    stale = snapshots(directory, prefix)[:-keep] if keep else []
+    for path in stale:
+        path.unlink()
+        # left by a snapshot opened while it was still in WAL mode
+        for side_file in ("-wal", "-shm"):
+            path.with_name(path.name + side_file).unlink(missing_ok=True)
+    return stale
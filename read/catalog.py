@@ -0,0 +1,268 @@
+"""Bulk import of an Open Library style catalog dump.
+
+The dump is streamed once per record type, authors first, then works and
+editions, so a work never arrives before its author. Only small maps from
+catalog keys and normalized names to primary keys are kept in memory, rows
+are written with bulk_create in batches.
+
+Lines are either JSON objects with a ``type`` field, or the tab separated
+rows of the Open Library dumps whose last column is the JSON record. Files
+ending in .gz are decompressed on the fly.
+"""
+
+import gzip
+import json
+import re
+
+from django.db import transaction
+
+from read import search, tasks
+from read.analytics import invalidate_analytics
+from read.filters import invalidate_facets
+from read.models import Author, Book, Edition, Genre
+
+BATCH_SIZE = 1000
+
+AUTHOR_TYPE = "/type/author"
+WORK_TYPE = "/type/work"
+EDITION_TYPE = "/type/edition"
+
+
+def normalize_text(value):
+    """Key used to spot the same name or title written differently"""
+    return " ".join((value or "").casefold().split())
+
+
+def isbn13_check_digit(digits):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits[:12]))
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn(value):
+    """ISBN-13 digits of an ISBN-10 or ISBN-13, None when it is not valid"""
+    isbn = re.sub(r"[^0-9X]", "", (value or "").upper())
+    if len(isbn) == 10:
+        if not isbn[:9].isdigit() or not (isbn[9].isdigit() or isbn[9] == "X"):
+            return None
+        total = sum((10 - i) * (10 if d == "X" else int(d)) for i, d in enumerate(isbn))
+        if total % 11:
+            return None
+        isbn = "978" + isbn[:9]
+        return isbn + isbn13_check_digit(isbn)
+    if len(isbn) == 13 and isbn.isdigit():
+        return isbn if isbn13_check_digit(isbn) == isbn[12] else None
+    return None
+
+
+def parse_year(value):
+    match = re.search(r"\b(1\d{3}|20\d{2})\b", value or "")
+    return int(match.group(1)) if match else None
+
+
+def edition_format(physical_format):
+    physical_format = (physical_format or "").casefold()
+    if "audio" in physical_format or "cd" in physical_format.split():
+        return "A"
+    if any(word in physical_format for word in ("ebook", "electronic", "kindle")):
+        return "D"
+    return "P"
+
+
+def records(path, record_type):
+    """Stream the records of one type from the dump"""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as lines:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                if f'"{record_type}"' not in line:
+                    continue
+                record = json.loads(line)
+                kind = record.get("type")
+                if isinstance(kind, dict):
+                    kind = kind.get("key")
+            else:
+                kind, _, rest = line.partition("\t")
+                if kind != record_type:
+                    continue
+                record = json.loads(rest.rsplit("\t", 1)[-1])
+            if kind == record_type:
+                yield record
+
+
+def first_key(items, field=None):
+    """Key of the first reference in a list like ``[{"key": ...}]``"""
+    for item in items or ():
+        if field:
+            item = item.get(field) or {}
+        if isinstance(item, dict) and item.get("key"):
+            return item["key"]
+    return None
+
+
+class CatalogImport:
+    def __init__(self, path, batch_size=BATCH_SIZE, edition_status="W"):
+        self.path = path
+        self.batch_size = batch_size
+        self.edition_status = edition_status
+        self.created = {"authors": 0, "books": 0, "editions": 0}
+        # catalog key -> primary key
+        self.author_keys = {}
+        self.work_keys = {}
+        # normalized values -> primary key, seeded with the existing rows
+        self.authors = {
+            normalize_text(name): pk
+            for pk, name in Author.objects.values_list("pk", "name").iterator()
+        }
+        self.books = {
+            (normalize_text(title), author): pk
+            for pk, title, author in Book.objects.values_list(
+                "pk", "title", "author"
+            ).iterator()
+        }
+        self.editions = set()
+        for isbn, book, subtitle, format in Edition.objects.values_list(
+            "isbn", "title", "subtitle", "format"
+        ).iterator():
+            self.editions.add(self.edition_key(isbn, book, subtitle, format))
+        self.genres = {
+            normalize_text(name): pk
+            for pk, name in Genre.objects.values_list("pk", "name")
+        }
+
+    def run(self):
+        self.import_authors()
+        self.import_works()
+        self.import_editions()
+        invalidate_analytics()
+        for model in (Author, Book, Genre):
+            invalidate_facets(model)
+        if self.created["editions"] and self.edition_status == "W":
+            tasks.enqueue("refresh_recommendations")
+        return self.created
+
+    @staticmethod
+    def edition_key(isbn, book, subtitle, format):
+        isbn = normalize_isbn(isbn)
+        return isbn or (book, normalize_text(subtitle), format)
+
+    def batches(self, record_type):
+        batch = []
+        for record in records(self.path, record_type):
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def import_authors(self):
+        for batch in self.batches(AUTHOR_TYPE):
+            new, pending = [], {}
+            for record in batch:
+                name = (record.get("name") or "").strip()[:50]
+                if not name:
+                    continue
+                name_key = normalize_text(name)
+                pk = self.authors.get(name_key)
+                if pk is not None:
+                    self.author_keys[record["key"]] = pk
+                    continue
+                if name_key not in pending:
+                    pending[name_key] = []
+                    new.append(Author(name=name, country=""))
+                pending[name_key].append(record["key"])
+            created = Author.objects.bulk_create(new)
+            for author in created:
+                name_key = normalize_text(author.name)
+                self.authors[name_key] = author.pk
+                for key in pending[name_key]:
+                    self.author_keys[key] = author.pk
+            self.created["authors"] += len(created)
+            search.reindex("author", [author.pk for author in created])
+
+    def import_works(self):
+        for batch in self.batches(WORK_TYPE):
+            new, pending, subjects = [], {}, []
+            for record in batch:
+                title = (record.get("title") or "").strip()[:50]
+                author = self.author_keys.get(
+                    first_key(record.get("authors"), "author")
+                )
+                if not title or author is None:
+                    continue
+                book_key = (normalize_text(title), author)
+                pk = self.books.get(book_key)
+                if pk is not None:
+                    self.work_keys[record["key"]] = pk
+                    continue
+                if book_key not in pending:
+                    pending[book_key] = []
+                    new.append(
+                        Book(
+                            title=title,
+                            author_id=author,
+                            publish_year=parse_year(record.get("first_publish_date")),
+                        )
+                    )
+                    subjects.append(record.get("subjects") or ())
+                pending[book_key].append(record["key"])
+            with transaction.atomic():
+                created = Book.objects.bulk_create(new)
+                genres = [
+                    Book.genres.through(book_id=book.pk, genre_id=genre)
+                    for book, names in zip(created, subjects)
+                    for genre in {
+                        self.genres.get(normalize_text(name)) for name in names
+                    }
+                    if genre is not None
+                ]
+                Book.genres.through.objects.bulk_create(genres, ignore_conflicts=True)
+            for book in created:
+                book_key = (normalize_text(book.title), book.author_id)
+                self.books[book_key] = book.pk
+                for key in pending[book_key]:
+                    self.work_keys[key] = book.pk
+            self.created["books"] += len(created)
+            search.reindex("book", [book.pk for book in created])
+
+    def import_editions(self):
+        for batch in self.batches(EDITION_TYPE):
+            new = []
+            for record in batch:
+                book = self.work_keys.get(first_key(record.get("works")))
+                if book is None:
+                    continue
+                isbn = normalize_isbn(
+                    next(
+                        iter(record.get("isbn_13") or record.get("isbn_10") or ()), None
+                    )
+                )
+                subtitle = (record.get("subtitle") or "").strip()[:50] or None
+                format = edition_format(record.get("physical_format"))
+                key = self.edition_key(isbn, book, subtitle, format)
+                if key in self.editions:
+                    continue
+                self.editions.add(key)
+                language = first_key(record.get("languages"))
+                pages = record.get("number_of_pages")
+                new.append(
+                    Edition(
+                        title_id=book,
+                        subtitle=subtitle,
+                        page_count=pages if isinstance(pages, int) else None,
+                        publish_year=parse_year(record.get("publish_date")),
+                        language=language.rsplit("/", 1)[-1] if language else None,
+                        format=format,
+                        isbn=isbn,
+                        status=self.edition_status,
+                    )
+                )
+            # duplicates of existing or earlier rows were skipped through
+            # self.editions, so every edition here is a new row
+            created = Edition.objects.bulk_create(new)
+            self.created["editions"] += len(created)
+            search.reindex("edition", [edition.pk for edition in created])
+            search.reindex("book", {edition.title_id for edition in created})
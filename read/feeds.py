@@ -0,0 +1,29 @@
+"""Keyset-paginated dashboard feeds, every page costs the same single query"""
+
+from datetime import date
+
+from read.models import Edition, Reading
+from read.pagination import keyset_page
+
+PAGE_SIZE = 8
+
+
+def currently_reading(cursor=None, size=PAGE_SIZE):
+    readings = Reading.objects.filter(current_status="R").select_related(
+        "edition__title__author"
+    )
+    return keyset_page(readings, cursor, size)
+
+
+def last_finished(cursor=None, size=PAGE_SIZE):
+    readings = Reading.objects.filter(
+        current_status="F", date_finished__isnull=False
+    ).select_related("edition__title__author")
+    return keyset_page(
+        readings, cursor, size, field="date_finished", parse=date.fromisoformat
+    )
+
+
+def want_to_read(cursor=None, size=PAGE_SIZE):
+    editions = Edition.objects.filter(status="W").select_related("title__author")
+    return keyset_page(editions, cursor, size)
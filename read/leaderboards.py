@@ -0,0 +1,15 @@
+"""Top and bottom rated books, read from the stored rating aggregates"""
+
+from read.models import Book
+
+
+def rated_books(worst=False, limit=5, genre=None, author=None, year=None):
+    books = Book.objects.filter(rating_average__isnull=False).select_related("author")
+    if genre is not None:
+        books = books.filter(genres=genre)
+    if author is not None:
+        books = books.filter(author=author)
+    if year is not None:
+        books = books.filter(publish_year=year)
+    ordering = ("rating_average", "id") if worst else ("-rating_average", "-id")
+    return books.order_by(*ordering)[:limit]
@@ -0,0 +1,121 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from read import backup
+
+
+class Command(BaseCommand):
+    help = (
+        "Take an online snapshot of the SQLite database without blocking writers, "
+        "or verify an existing snapshot"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            default=getattr(settings, "BACKUP_DIR", None),
+            help="Directory of the snapshots, defaults to the BACKUP_DIR setting",
+        )
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=backup.PAGES_PER_STEP,
+            help="Pages copied per step, the database is locked only during a step; "
+            "0 copies everything at once",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=backup.STEP_SLEEP,
+            help="Seconds to wait between steps",
+        )
+        parser.add_argument("--compress", action="store_true", help="Gzip the snapshot")
+        parser.add_argument(
+            "--keep",
+            type=int,
+            help="Number of snapshots to keep, older ones are deleted",
+        )
+        parser.add_argument(
+            "--verify",
+            metavar="PATH",
+            help="Only run an integrity check on an existing snapshot",
+        )
+        parser.add_argument(
+            "--refresh-snapshot",
+            action="store_true",
+            help="Only replace the read-only copy at SNAPSHOT_PATH that the "
+            "analytics views query",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            self.verify(options["verify"])
+            return
+        if options["refresh_snapshot"]:
+            self.refresh_snapshot(options)
+            return
+        if not options["output_dir"]:
+            raise CommandError("Set BACKUP_DIR or pass --output-dir")
+        if options["keep"] is not None and options["keep"] < 1:
+            raise CommandError("--keep must be positive")
+        database = self.source(options)
+
+        directory = Path(options["output_dir"])
+        directory.mkdir(parents=True, exist_ok=True)
+        prefix = Path(database.settings_dict["NAME"]).stem
+        stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+        path = backup.snapshot(
+            directory / f"{prefix}-{stamp}{backup.SNAPSHOT_SUFFIX}",
+            using=options["database"],
+            pages=options["pages"],
+            sleep=options["sleep"],
+        )
+        errors = backup.integrity_errors(path)
+        if errors:
+            raise CommandError(f"Snapshot {path} is corrupt: {'; '.join(errors)}")
+        if options["compress"]:
+            path = backup.compress(path)
+        self.stdout.write(self.style.SUCCESS(f"Snapshot written to {path}"))
+
+        if options["keep"]:
+            for stale in backup.rotate(directory, prefix, options["keep"]):
+                self.stdout.write(f"Removed {stale}")
+
+    def source(self, options):
+        database = connections[options["database"]]
+        if database.vendor != "sqlite":
+            raise CommandError("Online snapshots need an SQLite database")
+        return database
+
+    def refresh_snapshot(self, options):
+        self.source(options)
+        if not getattr(settings, "SNAPSHOT_PATH", None):
+            raise CommandError("Set SNAPSHOT_PATH to refresh the snapshot")
+        target = Path(settings.SNAPSHOT_PATH)
+        fresh = backup.snapshot(
+            target.with_name(target.name + ".new"),
+            using=options["database"],
+            pages=options["pages"],
+            sleep=options["sleep"],
+        )
+        errors = backup.integrity_errors(fresh)
+        if errors:
+            fresh.unlink()
+            raise CommandError(f"The new snapshot is corrupt: {'; '.join(errors)}")
+        # connections opened on the old file keep reading it until they close
+        os.replace(fresh, target)
+        self.stdout.write(self.style.SUCCESS(f"Snapshot {target} refreshed"))
+
+    def verify(self, path):
+        errors = backup.integrity_errors(path)
+        if errors:
+            raise CommandError(
+                f"Snapshot {path} failed the integrity check: {'; '.join(errors)}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Snapshot {path} is intact"))
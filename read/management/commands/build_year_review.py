@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+from read import review
+from read.models import ReadingLog
+
+
+class Command(BaseCommand):
+    help = "Build the stored year in review reports"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "years",
+            nargs="*",
+            type=int,
+            help="Years to build, defaults to every year with reading logs",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild the final reports of past years too",
+        )
+
+    def handle(self, *args, years, force=False, **options):
+        current = timezone.localdate().year
+        if any(year > current for year in years):
+            raise CommandError("Cannot review a year that has not started")
+        if not years:
+            years = sorted(
+                set(
+                    ReadingLog.objects.annotate(year=ExtractYear("date"))
+                    .values_list("year", flat=True)
+                    .distinct()
+                )
+            )
+        for year in years:
+            report = review.build(year, force=force)
+            state = "final" if report.is_final else "in progress"
+            self.stdout.write(
+                f"{year}: {report.data['books_finished']} books, "
+                f"{report.data['pages_read']} pages ({state})"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Built {len(years)} report(s)"))
@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: import the WSGI application, then time one
+# request through it up to its first byte
+CHILD = """
+import io, json, sys, time
+start = time.perf_counter()
+from media_log.wsgi import application
+imported = time.perf_counter()
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": sys.argv[1], "QUERY_STRING": "",
+    "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+    "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+    "wsgi.version": (1, 0), "wsgi.multithread": False, "wsgi.multiprocess": True,
+    "wsgi.run_once": False,
+}
+status = []
+body = iter(application(environ, lambda s, h, e=None: status.append(s)))
+next(body, b"")
+first_byte = time.perf_counter()
+for _ in body:
+    pass
+print(json.dumps({
+    "status": status[0], "import": imported - start,
+    "ttfb": first_byte - imported, "total": first_byte - start,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the time to first byte of fresh WSGI processes, "
+        "with and without the warm-up"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/read/", help="Path requested")
+        parser.add_argument(
+            "--runs", type=int, default=5, help="Processes started per variant"
+        )
+
+    def handle(self, *args, path, runs, **options):
+        if runs < 1:
+            raise CommandError("--runs must be positive")
+        for label, warm in (("cold", False), ("warm-up", True)):
+            results = [self.run_child(path, warm) for _ in range(runs)]
+            self.stdout.write(
+                f"{label:8} {results[0]['status']}  "
+                + "  ".join(
+                    f"{key} {median(result[key] for result in results) * 1000:7.1f} ms"
+                    for key in ("import", "ttfb", "total")
+                )
+            )
+
+    def run_child(self, path, warm):
+        environment = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", "media_log.settings"
+            ),
+        }
+        environment.pop("MEDIA_LOG_WARMUP", None)
+        if warm:
+            environment["MEDIA_LOG_WARMUP"] = "1"
+        child = subprocess.run(
+            [sys.executable, "-c", CHILD, path],
+            cwd=settings.BASE_DIR,
+            env=environment,
+            capture_output=True,
+            text=True,
+        )
+        if child.returncode:
+            raise CommandError(f"Benchmark process failed:\n{child.stderr}")
+        return json.loads(child.stdout.strip().splitlines()[-1])
@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from read.analytics import invalidate_analytics
+from read.filters import invalidate_facets
+from read.models import ReadingLog
+from read.signals import muted_log_receivers
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact the logs of readings finished long ago into one log per reading "
+        "per day, keeping the page totals"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=getattr(settings, "READ_LOG_RETENTION_DAYS", None),
+            help="Age in days of the finished readings to compact, "
+            "defaults to the READ_LOG_RETENTION_DAYS setting",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many logs would be removed",
+        )
+        parser.add_argument(
+            "--no-vacuum",
+            action="store_true",
+            help="Skip the VACUUM and ANALYZE of the database afterwards",
+        )
+
+    def handle(self, *args, older_than=None, dry_run=False, no_vacuum=False, **options):
+        if older_than is None:
+            raise CommandError(
+                "Log compaction is disabled, set READ_LOG_RETENTION_DAYS or pass --older-than"
+            )
+        if older_than < 0:
+            raise CommandError("--older-than must not be negative")
+        cutoff = timezone.now() - timedelta(days=older_than)
+
+        logs = (
+            ReadingLog.objects.filter(
+                reading__current_status="F",
+                reading__date_finished__lt=cutoff.date(),
+                date__lt=cutoff,
+            )
+            .order_by("reading_id", "date", "id")
+            .values_list("id", "reading_id", "date", "page_difference")
+        )
+        # the last log of a day already holds the day's final progress, it takes
+        # over the page differences of the logs it replaces
+        summaries, removed = [], []
+        day = kept = None
+        for log_id, reading_id, log_date, page_difference in logs.iterator(
+            chunk_size=2000
+        ):
+            key = (reading_id, timezone.localdate(log_date))
+            if key == day:
+                removed.append(kept.pk)
+                kept = ReadingLog(
+                    pk=log_id, page_difference=kept.page_difference + page_difference
+                )
+                kept_difference = page_difference
+                continue
+            if kept is not None and kept.page_difference != kept_difference:
+                summaries.append(kept)
+            day = key
+            kept = ReadingLog(pk=log_id, page_difference=page_difference)
+            kept_difference = page_difference
+        if kept is not None and kept.page_difference != kept_difference:
+            summaries.append(kept)
+
+        if dry_run:
+            self.stdout.write(
+                f"Would remove {len(removed)} log(s) and update {len(summaries)}"
+            )
+            return
+
+        if removed:
+            # the totals per day are unchanged, so the receivers that maintain
+            # the counters and caches have nothing to do
+            with transaction.atomic(), muted_log_receivers():
+                ReadingLog.objects.bulk_update(
+                    summaries, ["page_difference"], batch_size=BATCH_SIZE
+                )
+                for start in range(0, len(removed), BATCH_SIZE):
+                    ReadingLog.objects.filter(
+                        pk__in=removed[start : start + BATCH_SIZE]
+                    ).delete()
+            invalidate_analytics()
+            invalidate_facets(ReadingLog)
+
+        if not no_vacuum and connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                if removed:
+                    cursor.execute("VACUUM")
+                cursor.execute("ANALYZE")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {len(removed)} log(s), {len(summaries)} daily summaries updated"
+            )
+        )
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from read.catalog import BATCH_SIZE, CatalogImport
+from read.models import Edition
+
+
+class Command(BaseCommand):
+    help = (
+        "Import authors, works and editions from an Open Library style dump, "
+        "skipping the ones already in the catalog"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL or tab separated dump, may be gzipped")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Rows written per INSERT",
+        )
+        parser.add_argument(
+            "--status",
+            choices=list(Edition.STATUSES),
+            default="W",
+            help="Status of the imported editions",
+        )
+
+    def handle(self, *args, path, batch_size, status, **options):
+        if not Path(path).is_file():
+            raise CommandError(f"{path} does not exist")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+        created = CatalogImport(path, batch_size, status).run()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {created['authors']} author(s), {created['books']} "
+                f"book(s) and {created['editions']} edition(s)"
+            )
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from read import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search index of authors, books and editions"
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            raise CommandError("The search index needs an SQLite database")
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractYear
+
+from read.models import Reading, ReadingLog, YearlyProgress
+
+
+class Command(BaseCommand):
+    help = "Recompute the yearly progress counters from the reading logs and readings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare the stored counters with a full recompute, do not fix them",
+        )
+
+    def handle(self, *args, check=False, **options):
+        expected = {}
+        pages_per_year = (
+            ReadingLog.objects.annotate(year=ExtractYear("date"))
+            .values("year")
+            .annotate(total=Sum("page_difference"))
+        )
+        for row in pages_per_year:
+            expected.setdefault(row["year"], [0, 0])[0] = row["total"] or 0
+        books_per_year = (
+            Reading.objects.filter(current_status="F", date_finished__isnull=False)
+            .annotate(year=ExtractYear("date_finished"))
+            .values("year")
+            .annotate(total=Count("id"))
+        )
+        for row in books_per_year:
+            expected.setdefault(row["year"], [0, 0])[1] = row["total"]
+
+        stored = {
+            progress.year: [progress.pages_read, progress.books_finished]
+            for progress in YearlyProgress.objects.all()
+        }
+        mismatches = [
+            year
+            for year in sorted(expected.keys() | stored.keys())
+            if expected.get(year, [0, 0]) != stored.get(year, [0, 0])
+        ]
+        for year in mismatches:
+            pages, books = expected.get(year, [0, 0])
+            stored_pages, stored_books = stored.get(year, [0, 0])
+            self.stdout.write(
+                f"{year}: stored {stored_pages} pages / {stored_books} books, "
+                f"expected {pages} pages / {books} books"
+            )
+
+        if not mismatches:
+            self.stdout.write(
+                self.style.SUCCESS("Yearly progress counters are correct")
+            )
+            return
+        if check:
+            raise CommandError(f"{len(mismatches)} year(s) out of sync")
+
+        with transaction.atomic():
+            for year in mismatches:
+                pages, books = expected.get(year, [0, 0])
+                YearlyProgress.objects.update_or_create(
+                    year=year, defaults={"pages_read": pages, "books_finished": books}
+                )
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the counters of {len(mismatches)} year(s)")
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from read import recommendations
+
+
+class Command(BaseCommand):
+    help = "Rank the want to read books against the finished, rated readings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=recommendations.TOP,
+            help="Number of recommendations to keep",
+        )
+
+    def handle(self, *args, top, **options):
+        count = recommendations.refresh(top)
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} recommendation(s)"))
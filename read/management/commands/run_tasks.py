@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from read import tasks
+from read.models import Job
+
+
+class Command(BaseCommand):
+    help = "Run the queued background jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            help="Jobs run at the same time, defaults to READ_TASKS_THREADS",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for new jobs",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Queue the failed jobs again before starting",
+        )
+
+    def handle(self, *args, threads=None, once=False, retry_failed=False, **options):
+        if retry_failed:
+            failed = list(Job.objects.filter(status=Job.FAILED))
+            for job in failed:
+                tasks.requeue(job)
+            self.stdout.write(f"Queued {len(failed)} failed job(s) again")
+        worker = tasks.Worker(threads=threads)
+        try:
+            worker.run(until_idle=once)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.stop()
+        failed = Job.objects.filter(status=Job.FAILED).count()
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} job(s) failed"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:42
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractYear
+
+
+def backfill_yearly_progress(apps, schema_editor):
+    Reading = apps.get_model("read", "Reading")
+    ReadingLog = apps.get_model("read", "ReadingLog")
+    YearlyProgress = apps.get_model("read", "YearlyProgress")
+    totals = {}
+    pages_per_year = (
+        ReadingLog.objects.annotate(year=ExtractYear("date"))
+        .values("year")
+        .annotate(total=Sum("page_difference"))
+    )
+    for row in pages_per_year:
+        totals.setdefault(row["year"], [0, 0])[0] = row["total"] or 0
+    books_per_year = (
+        Reading.objects.filter(current_status="F", date_finished__isnull=False)
+        .annotate(year=ExtractYear("date_finished"))
+        .values("year")
+        .annotate(total=Count("id"))
+    )
+    for row in books_per_year:
+        totals.setdefault(row["year"], [0, 0])[1] = row["total"]
+    YearlyProgress.objects.bulk_create(
+        YearlyProgress(year=year, pages_read=pages, books_finished=books)
+        for year, (pages, books) in totals.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("read", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReadingGoal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.IntegerField(unique=True)),
+                ("pages_target", models.IntegerField(blank=True, null=True)),
+                ("books_target", models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-year"],
+            },
+        ),
+        migrations.CreateModel(
+            name="YearlyProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.IntegerField(unique=True)),
+                ("pages_read", models.IntegerField(default=0)),
+                ("books_finished", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "Yearly Progress",
+                "ordering": ["-year"],
+            },
+        ),
+        migrations.RunPython(backfill_yearly_progress, migrations.RunPython.noop),
+    ]
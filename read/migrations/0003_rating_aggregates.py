@@ -0,0 +1,89 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:46
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Book = apps.get_model("read", "Book")
+    Edition = apps.get_model("read", "Edition")
+    for model, reading_path in ((Edition, "readings"), (Book, "editions__readings")):
+        rated = model.objects.filter(
+            **{f"{reading_path}__rating__isnull": False}
+        ).annotate(
+            total=Sum(f"{reading_path}__rating"),
+            count=Count(f"{reading_path}__rating"),
+        )
+        for obj in rated:
+            obj.rating_sum = obj.total
+            obj.rating_count = obj.count
+            obj.rating_average = obj.total / obj.count
+        model.objects.bulk_update(
+            rated, ["rating_sum", "rating_count", "rating_average"], batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("read", "0002_yearly_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="rating_average",
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_sum",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="edition",
+            name="rating_average",
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="edition",
+            name="rating_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="edition",
+            name="rating_sum",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["rating_average"], name="read_book_rating__d8c25c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["author", "rating_average"], name="read_book_author__8209d5_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["publish_year", "rating_average"],
+                name="read_book_publish_1e0033_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="edition",
+            index=models.Index(
+                fields=["rating_average"], name="read_editio_rating__ab0921_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
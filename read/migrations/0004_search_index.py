@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# The index as it was created at this point, read.search keeps it up to date
+# afterwards. Rowids are ``id * 4 + kind``, 1 author, 2 book and 3 edition.
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS read_search USING fts5(
+    title, author, series, subtitle, isbn,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+POPULATE = [
+    """
+    INSERT INTO read_search(rowid, title, author, series, subtitle, isbn)
+    SELECT a.id * 4 + 1, '', a.name, '', '', ''
+    FROM read_author a
+    """,
+    """
+    INSERT INTO read_search(rowid, title, author, series, subtitle, isbn)
+    SELECT b.id * 4 + 2, b.title, a.name, coalesce(s.title, ''),
+        coalesce((SELECT group_concat(e.subtitle, ' ')
+                  FROM read_edition e WHERE e.title_id = b.id), ''),
+        coalesce((SELECT group_concat(replace(e.isbn, '-', ''), ' ')
+                  FROM read_edition e WHERE e.title_id = b.id), '')
+    FROM read_book b
+    JOIN read_author a ON a.id = b.author_id
+    LEFT JOIN read_series s ON s.id = b.series_id
+    """,
+    """
+    INSERT INTO read_search(rowid, title, author, series, subtitle, isbn)
+    SELECT e.id * 4 + 3, b.title, a.name, coalesce(s.title, ''),
+        coalesce(e.subtitle, ''), coalesce(replace(e.isbn, '-', ''), '')
+    FROM read_edition e
+    JOIN read_book b ON b.id = e.title_id
+    JOIN read_author a ON a.id = b.author_id
+    LEFT JOIN read_series s ON s.id = b.series_id
+    """,
+    "INSERT INTO read_search(read_search) VALUES ('optimize')",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS read_search")
+    schema_editor.execute(CREATE_TABLE)
+    for statement in POPULATE:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS read_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("read", "0003_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
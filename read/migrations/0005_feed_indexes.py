@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("read", "0004_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="edition",
+            index=models.Index(
+                fields=["status", "id"], name="read_editio_status_73b685_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reading",
+            index=models.Index(
+                fields=["current_status", "date_finished", "id"],
+                name="read_readin_current_d4f0fc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reading",
+            index=models.Index(
+                fields=["current_status", "id"], name="read_readin_current_44b8fe_idx"
+            ),
+        ),
+    ]
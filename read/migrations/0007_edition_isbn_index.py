@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("read", "0006_job"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="edition",
+            index=models.Index(fields=["isbn"], name="read_editio_isbn_fc6cd4_idx"),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("read", "0007_edition_isbn_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="edition",
+            index=models.Index(
+                fields=["title", "status"], name="read_editio_title_i_f5a69f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reading",
+            index=models.Index(
+                condition=models.Q(("rating__isnull", False)),
+                fields=["edition", "rating"],
+                name="read_reading_rated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="readinglog",
+            index=models.Index(
+                condition=models.Q(("page_difference__gt", 0)),
+                fields=["date", "page_difference"],
+                name="read_readinglog_progress_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("read", "0008_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="YearInReview",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.IntegerField(unique=True)),
+                ("data", models.JSONField(default=dict)),
+                ("html", models.TextField(blank=True)),
+                ("generated_at", models.DateTimeField()),
+                ("is_final", models.BooleanField(default=False)),
+            ],
+            options={
+                "verbose_name_plural": "Years in Review",
+                "ordering": ["-year"],
+            },
+        ),
+    ]
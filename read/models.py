@@ -1,3 +1,5 @@
+from datetime import date
+
 from django.db import models
 from django.forms import ValidationError
 from django.utils import timezone
@@ -39,7 +41,23 @@ class Series(models.Model):
         verbose_name_plural = "Series"
 
 
-class Book(models.Model):
+RATING_AGGREGATES = ("rating_sum", "rating_count", "rating_average")
+
+
+class RatingAggregatesMixin:
+    def save(self, *args, **kwargs):
+        # The rating aggregates are only changed through add_rating_aggregates,
+        # so saving an instance loaded earlier does not overwrite newer values
+        if not self._state.adding and not kwargs.get("update_fields"):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_AGGREGATES
+            ]
+        super().save(*args, **kwargs)
+
+
+class Book(RatingAggregatesMixin, models.Model):
     title = models.CharField(max_length=50)
     author = models.ForeignKey(Author, on_delete=models.CASCADE)
     awards = models.ManyToManyField(Award, blank=True, through="BookAward")
@@ -49,6 +67,18 @@ class Book(models.Model):
     page_count = models.IntegerField(null=True)
     series = models.ForeignKey(Series, on_delete=models.SET_NULL, null=True, blank=True)
     series_order = models.FloatField(null=True, blank=True)
+    # Rating aggregates of all the readings of all the editions,
+    # maintained by the signals in read.signals
+    rating_sum = models.FloatField(default=0, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
+    rating_average = models.FloatField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["rating_average"]),
+            models.Index(fields=["author", "rating_average"]),
+            models.Index(fields=["publish_year", "rating_average"]),
+        ]
 
     def clean(self):
         """Ensure series_order is required when series is not null"""
@@ -74,12 +104,9 @@ class Book(models.Model):
 
     @property
     def average_rating(self):
-        ratings = [
-            edition.average_rating
-            for edition in self.editions.all()
-            if edition.average_rating is not None
-        ]
-        return round(sum(ratings) / len(ratings), 2) if ratings else None
+        return (
+            round(self.rating_average, 2) if self.rating_average is not None else None
+        )
 
 
 class BookAward(models.Model):
@@ -97,7 +124,7 @@ class BookAward(models.Model):
         return f"{self.prize.name}({self.year}): {self.book.title}"
 
 
-class Edition(models.Model):
+class Edition(RatingAggregatesMixin, models.Model):
     FORMATS = {"P": "print", "D": "digital", "A": "audio"}
     STATUSES = {"W": "want to read", "P": "in progress", "F": "finished"}
     title = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="editions")
@@ -108,16 +135,53 @@ class Edition(models.Model):
     format = models.CharField(max_length=1, choices=FORMATS)
     isbn = models.CharField(max_length=14, null=True, blank=True)
     status = models.CharField(max_length=1, choices=STATUSES, default="W")
+    # Rating aggregates of the readings, maintained by the signals in read.signals
+    rating_sum = models.FloatField(default=0, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
+    rating_average = models.FloatField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["rating_average"]),
+            models.Index(fields=["status", "id"]),
+            models.Index(fields=["isbn"]),
+            # Book.status and the admin's status annotations
+            models.Index(fields=["title", "status"]),
+        ]
 
     def __str__(self):
         return f"{self.title.title} - {self.FORMATS.get(self.format)}"
 
     @property
     def average_rating(self):
-        ratings = self.readings.filter(rating__isnull=False).values_list(
-            "rating", flat=True
+        return (
+            round(self.rating_average, 2) if self.rating_average is not None else None
         )
-        return round(sum(ratings) / len(ratings), 2) if ratings else None
+
+    @classmethod
+    def add_ratings(cls, edition_id, total, count):
+        """Add ``count`` ratings summing to ``total`` to an edition and its book,
+        negative values remove them"""
+        if edition_id is None or not count:
+            return
+        add_rating_aggregates(cls.objects.filter(pk=edition_id), total, count)
+        add_rating_aggregates(Book.objects.filter(editions=edition_id), total, count)
+
+
+def add_rating_aggregates(queryset, total, count):
+    queryset.update(
+        rating_sum=models.F("rating_sum") + total,
+        rating_count=models.F("rating_count") + count,
+    )
+    queryset.update(
+        rating_average=models.Case(
+            models.When(
+                rating_count__gt=0,
+                then=models.F("rating_sum") / models.F("rating_count"),
+            ),
+            default=None,
+        )
+    )
 
 
 class Reading(models.Model):
@@ -132,9 +196,28 @@ class Reading(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(10)], null=True, blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["current_status", "date_finished", "id"]),
+            models.Index(fields=["current_status", "id"]),
+            # covers the rating aggregates per edition
+            models.Index(
+                fields=["edition", "rating"],
+                condition=models.Q(rating__isnull=False),
+                name="read_reading_rated_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.edition.title.title}, started: {self.date_started}"
 
+    @property
+    def finished_year(self):
+        """Year the reading counts towards, None while it is not finished"""
+        if self.current_status == "F" and self.date_finished:
+            return self.date_finished.year
+        return None
+
     @property
     def percentage_complete(self):
         latest_update = self.logs.order_by("-date").first()
@@ -191,24 +274,26 @@ class ReadingLog(models.Model):
             self.page_difference = max(0, self.computed_pages)
         super().save(*args, **kwargs)
 
-    def update_subsequent_logs(self):
-        # Update all subsequent logs in the same reading
-        subsequent_logs = (
-            ReadingLog.objects.filter(reading=self.reading)
-            .filter(date__gt=self.date)
-            .order_by("date")
+    @classmethod
+    def recompute_page_differences(cls, reading_id, since):
+        """Recompute the page differences of a reading's logs from ``since`` on"""
+        previous_log = (
+            cls.objects.filter(reading=reading_id, date__lt=since)
+            .order_by("-date")
+            .first()
+        )
+        logs = cls.objects.filter(reading=reading_id, date__gte=since).order_by("date")
+        update_page_differences(
+            logs, previous_log.computed_pages if previous_log else 0
         )
-        current_pages = self.computed_pages
-        for log in subsequent_logs:
-            new_diff = max(log.computed_pages - current_pages)
-            if log.page_difference != new_diff:
-                log.page_difference = new_diff
-                log.save(update_fields=["page_difference"])
-            current_pages = log.computed_pages
 
     def __str__(self):
         return f"{self.reading.edition.title.title} - {self.pages_read} pages on {self.date}"
 
+    @property
+    def year(self):
+        return timezone.localtime(self.date).year
+
     class Meta:
         verbose_name_plural = "Reading Logs"
         indexes = [
@@ -219,5 +304,155 @@ class ReadingLog(models.Model):
                 ]
             ),
             models.Index(fields=["date"]),
+            # covers the heatmap's daily totals
+            models.Index(
+                fields=["date", "page_difference"],
+                condition=models.Q(page_difference__gt=0),
+                name="read_readinglog_progress_idx",
+            ),
         ]
         ordering = ["date"]
+
+
+def update_page_differences(logs, current_pages):
+    """Chain the page differences of ``logs`` on from ``current_pages``"""
+    for log in logs:
+        new_diff = max(0, log.computed_pages - current_pages)
+        if log.page_difference != new_diff:
+            log.page_difference = new_diff
+            log.save(update_fields=["page_difference"])
+        current_pages = log.computed_pages
+
+
+class ReadingGoal(models.Model):
+    year = models.IntegerField(unique=True)
+    pages_target = models.IntegerField(null=True, blank=True)
+    books_target = models.IntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Reading goal for {self.year}"
+
+    @property
+    def progress(self):
+        return YearlyProgress.objects.filter(year=self.year).first() or YearlyProgress(
+            year=self.year
+        )
+
+    @property
+    def days_left(self):
+        """Days left in the goal's year, today included"""
+        today = timezone.localdate()
+        if today.year > self.year:
+            return 0
+        start = max(today, date(self.year, 1, 1))
+        return (date(self.year, 12, 31) - start).days + 1
+
+    def required_pace(self, progress=None):
+        """Pages and books per day still needed to reach the target"""
+        progress = progress or self.progress
+        days_left = self.days_left
+        pages_left = max(0, (self.pages_target or 0) - progress.pages_read)
+        books_left = max(0, (self.books_target or 0) - progress.books_finished)
+        return {
+            "pages_left": pages_left,
+            "books_left": books_left,
+            "days_left": days_left,
+            "pages_per_day": round(pages_left / days_left, 1) if days_left else None,
+            "books_per_day": round(books_left / days_left, 3) if days_left else None,
+        }
+
+    class Meta:
+        ordering = ["-year"]
+
+
+class YearlyProgress(models.Model):
+    """Running totals per year, kept up to date by the signals in read.signals"""
+
+    year = models.IntegerField(unique=True)
+    pages_read = models.IntegerField(default=0)
+    books_finished = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}: {self.pages_read} pages, {self.books_finished} books"
+
+    @classmethod
+    def increment(cls, year, pages=0, books=0):
+        if year is None or (not pages and not books):
+            return
+        updated = cls.objects.filter(year=year).update(
+            pages_read=models.F("pages_read") + pages,
+            books_finished=models.F("books_finished") + books,
+        )
+        if not updated:
+            cls.objects.get_or_create(
+                year=year, defaults={"pages_read": pages, "books_finished": books}
+            )
+
+    class Meta:
+        verbose_name_plural = "Yearly Progress"
+        ordering = ["-year"]
+
+
+class Job(models.Model):
+    """Deferred work run by the worker in read.tasks, done jobs are deleted"""
+
+    QUEUED = "Q"
+    RUNNING = "R"
+    FAILED = "F"
+    STATUSES = {QUEUED: "queued", RUNNING: "running", FAILED: "failed"}
+    name = models.CharField(max_length=100)
+    # jobs with the same key are merged while they wait
+    key = models.CharField(max_length=200)
+    arguments = models.JSONField(default=dict)
+    status = models.CharField(max_length=1, choices=STATUSES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.get_status_display()})"
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status="Q"),
+                name="unique_queued_job_key",
+            )
+        ]
+
+
+class YearInReview(models.Model):
+    """Stored year in review report built by read.review, final once the year is over"""
+
+    year = models.IntegerField(unique=True)
+    data = models.JSONField(default=dict)
+    html = models.TextField(blank=True)
+    generated_at = models.DateTimeField()
+    is_final = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Year in review {self.year}"
+
+    class Meta:
+        verbose_name_plural = "Years in Review"
+        ordering = ["-year"]
+
+
+class Recommendation(models.Model):
+    """Ranked want to read editions built by read.recommendations"""
+
+    edition = models.OneToOneField(
+        Edition, on_delete=models.CASCADE, related_name="recommendation"
+    )
+    rank = models.IntegerField(unique=True)
+    score = models.FloatField()
+    generated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.rank}. {self.edition}"
+
+    class Meta:
+        ordering = ["rank"]
@@ -0,0 +1,193 @@
+"""Reading pace: average pages per day, recent velocity and projected finish date.
+
+The paces of all the readings on a page are computed together from a single
+query over their logs, and cached per reading until it gets a new log.
+"""
+
+import math
+from datetime import UTC, datetime, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from read.models import ReadingLog
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Number of days looked back when computing the recent velocity
+RECENT_DAYS = 14
+CACHE_TIMEOUT = 60 * 60 * 24
+SECONDS_PER_DAY = 60 * 60 * 24
+
+
+def cache_key(reading_id, today=None):
+    # the average pace depends on the current day, so the key does too
+    today = today or timezone.localdate()
+    return f"read:pace:{reading_id}:{today.isoformat()}"
+
+
+def invalidate_pace(reading_id):
+    cache.delete(cache_key(reading_id))
+
+
+def reading_paces(readings):
+    """Return {reading id: pace} for the given readings"""
+    readings = {reading.id: reading for reading in readings}
+    today = timezone.localdate()
+    keys = {cache_key(reading_id, today): reading_id for reading_id in readings}
+    paces = {keys[key]: pace for key, pace in cache.get_many(keys).items()}
+
+    missing = [
+        reading for reading_id, reading in readings.items() if reading_id not in paces
+    ]
+    if missing:
+        computed = compute_paces(missing, today)
+        cache.set_many(
+            {
+                cache_key(reading_id, today): pace
+                for reading_id, pace in computed.items()
+            },
+            CACHE_TIMEOUT,
+        )
+        paces.update(computed)
+    return paces
+
+
+def compute_paces(readings, today=None):
+    today = today or timezone.localdate()
+    readings = {reading.id: reading for reading in readings}
+    logs = (
+        ReadingLog.objects.filter(reading_id__in=readings)
+        .order_by("reading_id", "date")
+        .values_list(
+            "reading_id",
+            "date",
+            "computed_pages",
+            "resolved_page_count",
+            "percentage_read",
+        )
+    )
+    reading_ids, days, pages, totals = [], [], [], []
+    latest_percentage = {}
+    for reading_id, date, computed_pages, resolved_page_count, percentage_read in logs:
+        # same rule as Reading.percentage_complete, on the latest log
+        if percentage_read is not None:
+            latest_percentage[reading_id] = percentage_read
+        else:
+            latest_percentage[reading_id] = int(
+                computed_pages / resolved_page_count * 100
+            )
+        reading_ids.append(reading_id)
+        days.append(date.timestamp() / SECONDS_PER_DAY)
+        pages.append(computed_pages)
+        totals.append(resolved_page_count)
+
+    now = timezone.now().timestamp() / SECONDS_PER_DAY
+    regress = _regress_numpy if np is not None else _regress_python
+    stats = regress(reading_ids, days, pages, totals, now - RECENT_DAYS)
+
+    paces = {}
+    for reading_id, reading in readings.items():
+        if reading_id not in stats:
+            paces[reading_id] = {
+                "average": None,
+                "velocity": None,
+                "projected_finish": None,
+                "percentage_complete": 0,
+            }
+            continue
+        first_day, latest_pages, total_pages, velocity = stats[reading_id]
+        started = reading.date_started or timezone.localdate(
+            datetime.fromtimestamp(first_day * SECONDS_PER_DAY, tz=UTC)
+        )
+        elapsed_days = max(1, (today - started).days + 1)
+        average = latest_pages / elapsed_days
+        paces[reading_id] = {
+            "average": round(average, 1),
+            "velocity": round(velocity, 1) if velocity is not None else None,
+            "projected_finish": _projected_finish(
+                today, total_pages - latest_pages, velocity or average
+            ),
+            "percentage_complete": latest_percentage[reading_id],
+        }
+    return paces
+
+
+def _projected_finish(today, pages_left, pages_per_day):
+    if pages_left <= 0:
+        return today
+    if not pages_per_day or pages_per_day <= 0:
+        return None
+    return today + timedelta(days=math.ceil(pages_left / pages_per_day))
+
+
+def _regress_numpy(reading_ids, days, pages, totals, cutoff):
+    """Least squares slope of pages over days for every reading at once.
+
+    Rows come sorted by reading, so each reading is a contiguous group and
+    every per-reading sum is a single bincount over the group index.
+    """
+    if not reading_ids:
+        return {}
+    reading_ids = np.asarray(reading_ids)
+    days = np.asarray(days, dtype=float)
+    y = np.asarray(pages, dtype=float)
+    starts = np.flatnonzero(np.r_[True, reading_ids[1:] != reading_ids[:-1]])
+    ends = np.r_[starts[1:], len(reading_ids)] - 1
+    group = np.repeat(np.arange(len(starts)), ends - starts + 1)
+
+    # centre the days of every group to keep the sums numerically stable
+    x = days - days[starts][group]
+    weight = (days >= cutoff).astype(float)
+    n = np.bincount(group, weight)
+    sum_x = np.bincount(group, weight * x)
+    sum_y = np.bincount(group, weight * y)
+    sum_xx = np.bincount(group, weight * x * x)
+    sum_xy = np.bincount(group, weight * x * y)
+    denominator = n * sum_xx - sum_x**2
+    valid = (n >= 2) & (denominator > 1e-9)
+    slope = np.divide(
+        n * sum_xy - sum_x * sum_y,
+        denominator,
+        out=np.zeros_like(denominator),
+        where=valid,
+    )
+    return {
+        int(reading_ids[start]): (
+            float(days[start]),
+            int(pages[end]),
+            totals[end],
+            float(slope[i]) if valid[i] else None,
+        )
+        for i, (start, end) in enumerate(zip(starts, ends))
+    }
+
+
+def _regress_python(reading_ids, days, pages, totals, cutoff):
+    stats = {}
+    start = 0
+    for end in range(len(reading_ids)):
+        if end + 1 < len(reading_ids) and reading_ids[end + 1] == reading_ids[start]:
+            continue
+        recent = [
+            (days[i] - days[start], pages[i])
+            for i in range(start, end + 1)
+            if days[i] >= cutoff
+        ]
+        n = len(recent)
+        sum_x = sum(x for x, _ in recent)
+        sum_y = sum(y for _, y in recent)
+        sum_xx = sum(x * x for x, _ in recent)
+        sum_xy = sum(x * y for x, y in recent)
+        denominator = n * sum_xx - sum_x**2
+        slope = (
+            (n * sum_xy - sum_x * sum_y) / denominator
+            if n >= 2 and denominator > 1e-9
+            else None
+        )
+        stats[reading_ids[start]] = (days[start], pages[end], totals[end], slope)
+        start = end + 1
+    return stats
@@ -0,0 +1,111 @@
+"""Pagination helpers for large tables: keyset cursors and estimated counts"""
+
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CURSOR_SEPARATOR = ","
+
+
+def encode_cursor(*values):
+    """Serialize the ordering values of the last row of a page"""
+    return CURSOR_SEPARATOR.join(
+        value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+        for value in values
+    )
+
+
+def decode_cursor(cursor, *parsers):
+    """Parse a cursor made by encode_cursor, one parser per value.
+
+    Return None when the cursor is missing or malformed.
+    """
+    if not cursor:
+        return None
+    values = cursor.split(CURSOR_SEPARATOR)
+    if len(values) != len(parsers):
+        return None
+    try:
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except ValueError:
+        return None
+
+
+def rows_before(queryset, field, value, pk):
+    """Rows after the cursor row (value, pk) in ``-field, -pk`` order"""
+    return queryset.filter(
+        Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk})
+    )
+
+
+def keyset_page(queryset, cursor, size, field=None, parse=None):
+    """One page of ``queryset`` in ``-field, -pk`` order (``-pk`` without a field).
+
+    Return the rows and the cursor of the next page, None on the last page.
+    ``parse`` turns the cursor's field value back into a Python value.
+    """
+    if field:
+        queryset = queryset.order_by(f"-{field}", "-pk")
+        position = decode_cursor(cursor, parse, int)
+        if position:
+            queryset = rows_before(queryset, field, *position)
+    else:
+        queryset = queryset.order_by("-pk")
+        position = decode_cursor(cursor, int)
+        if position:
+            queryset = queryset.filter(pk__lt=position[0])
+
+    rows = list(queryset[: size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    if field:
+        return rows, encode_cursor(getattr(last, field), last.pk)
+    return rows, encode_cursor(last.pk)
+
+
+def estimated_row_count(model, using="default"):
+    """Row count of a table from the statistics of the last ANALYZE, if any"""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )
+        if cursor.fetchone() is None:
+            return None
+        table = model._meta.db_table
+        cursor.execute("SELECT idx, stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+        stats = cursor.fetchall()
+        # the stats of a partial index only count the rows it covers
+        cursor.execute(f"PRAGMA index_list({connection.ops.quote_name(table)})")
+        partial = {row[1] for row in cursor.fetchall() if row[4]}
+    for index, stat in stats:
+        if index is None or index == table or index not in partial:
+            return int(stat.split()[0])
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Use the table statistics instead of COUNT(*) for unfiltered querysets
+    when READ_ESTIMATED_COUNTS is on"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if (
+            getattr(settings, "READ_ESTIMATED_COUNTS", False)
+            and not queryset.query.where
+        ):
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            # the admin lists a single page whole, so a stale estimate of a
+            # table that has grown since must not fit on one
+            if estimate is not None and estimate > self.per_page:
+                return estimate
+        return super().count
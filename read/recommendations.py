@@ -0,0 +1,157 @@
+"""Want to read recommendations, ranked once and stored in Recommendation.
+
+Every book is a sparse unit vector over its genres, author and series. The
+taste profile sums the vectors of the finished, rated readings, weighted by
+how far each rating is from NEUTRAL_RATING, so disliked books count against
+their features. The books that are only on the want to read list are ranked
+by cosine similarity to the profile and the TOP best are stored. A job
+rebuilds the list when a reading is finished or its rating changes.
+"""
+
+import heapq
+import math
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from read.models import Book, Edition, Reading, Recommendation
+
+TOP = 50
+NEUTRAL_RATING = 5
+FEATURE_WEIGHTS = {"genre": 1.0, "author": 1.5, "series": 2.0}
+# keeps the IN lists below SQLite's variable limit
+CHUNK_SIZE = 500
+
+BookGenre = Book.genres.through
+
+
+def chunks(items, size=CHUNK_SIZE):
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def book_vectors(books):
+    """Unit feature vectors of ``(id, author_id, series_id)`` rows by book id"""
+    books = list(books)
+    genres = {}
+    for book_id, genre_id in BookGenre.objects.filter(
+        book_id__in=[book[0] for book in books]
+    ).values_list("book_id", "genre_id"):
+        genres.setdefault(book_id, []).append(genre_id)
+    vectors = {}
+    for book_id, author_id, series_id in books:
+        vector = {
+            ("genre", genre_id): FEATURE_WEIGHTS["genre"]
+            for genre_id in genres.get(book_id, ())
+        }
+        vector[("author", author_id)] = FEATURE_WEIGHTS["author"]
+        if series_id is not None:
+            vector[("series", series_id)] = FEATURE_WEIGHTS["series"]
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        vectors[book_id] = {
+            feature: weight / norm for feature, weight in vector.items()
+        }
+    return vectors
+
+
+def taste_profile():
+    """Unit vector of the features of the finished, rated books, empty without
+    ratings"""
+    weights = {}
+    rated = Reading.objects.filter(
+        current_status="F", rating__isnull=False
+    ).values_list("edition__title_id", "rating")
+    for book_id, rating in rated:
+        weights[book_id] = weights.get(book_id, 0) + rating - NEUTRAL_RATING
+    profile = {}
+    for chunk in chunks(weights):
+        books = Book.objects.filter(pk__in=chunk).values_list(
+            "id", "author_id", "series_id"
+        )
+        for book_id, vector in book_vectors(books).items():
+            for feature, value in vector.items():
+                profile[feature] = profile.get(feature, 0) + weights[book_id] * value
+    norm = math.sqrt(sum(value * value for value in profile.values()))
+    return {feature: value / norm for feature, value in profile.items()} if norm else {}
+
+
+def candidates(profile):
+    """Books only on the want to read list sharing a liked feature with the
+    profile, the others cannot score above zero"""
+    liked = {kind: [] for kind in FEATURE_WEIGHTS}
+    for (kind, key), value in profile.items():
+        if value > 0:
+            liked[kind].append(key)
+    return (
+        Book.objects.filter(editions__status="W")
+        .exclude(editions__status__in=("P", "F"))
+        .filter(
+            Q(author__in=liked["author"])
+            | Q(series__in=liked["series"])
+            | Q(
+                pk__in=BookGenre.objects.filter(genre__in=liked["genre"]).values(
+                    "book_id"
+                )
+            )
+        )
+        .distinct()
+        .values_list("id", "author_id", "series_id")
+    )
+
+
+def rank(size=TOP):
+    """The ``size`` best ``(score, book_id)`` pairs, best first"""
+    profile = taste_profile()
+    if not profile:
+        return []
+
+    def scores():
+        for chunk in chunks(list(candidates(profile))):
+            for book_id, vector in book_vectors(chunk).items():
+                score = sum(
+                    profile.get(feature, 0) * v for feature, v in vector.items()
+                )
+                if score > 0:
+                    yield score, -book_id
+
+    return [(score, -book_id) for score, book_id in heapq.nlargest(size, scores())]
+
+
+def refresh(size=TOP):
+    """Replace the stored recommendations, return how many there are"""
+    ranked = rank(size)
+    editions = {}
+    for chunk in chunks(book_id for _, book_id in ranked):
+        editions.update(
+            Edition.objects.filter(title__in=chunk, status="W")
+            .values("title")
+            .annotate(first=Min("id"))
+            .values_list("title", "first")
+        )
+    now = timezone.now()
+    recommendations = [
+        Recommendation(
+            edition_id=editions[book_id], rank=position, score=score, generated_at=now
+        )
+        for position, (score, book_id) in enumerate(
+            # a book can have left the list since it was ranked
+            (pair for pair in ranked if pair[1] in editions),
+            1,
+        )
+    ]
+    with transaction.atomic():
+        Recommendation.objects.all().delete()
+        Recommendation.objects.bulk_create(recommendations)
+    return len(recommendations)
+
+
+def recommended(size=TOP):
+    """The stored recommendations still on the want to read list, one query"""
+    return list(
+        Recommendation.objects.filter(edition__status="W").select_related(
+            "edition__title__author"
+        )[:size]
+    )
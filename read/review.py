@@ -0,0 +1,152 @@
+"""Year in review reports, computed once and stored in YearInReview.
+
+A report of a past year is final and never recomputed. The report of the
+current year is rebuilt by a job whenever its logs or readings change, and
+on request once it is older than REFRESH in case no worker runs the job.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from read.models import BookAward, Reading, ReadingLog, YearInReview
+
+TOP = 5
+REFRESH = timedelta(hours=1)
+
+
+def first_year():
+    """Year of the first reading log or finished reading, None without any"""
+    first_log = ReadingLog.objects.aggregate(first=Min("date"))["first"]
+    first_finished = Reading.objects.filter(current_status="F").aggregate(
+        first=Min("date_finished")
+    )["first"]
+    years = []
+    if first_log:
+        years.append(timezone.localtime(first_log).year)
+    if first_finished:
+        years.append(first_finished.year)
+    return min(years, default=None)
+
+
+def longest_streak(days):
+    """Longest run of consecutive dates in a sorted list, with its first day"""
+    best, best_start, length, start, previous = 0, None, 0, None, None
+    for day in days:
+        if previous is not None and day - previous == timedelta(days=1):
+            length += 1
+        else:
+            length, start = 1, day
+        if length > best:
+            best, best_start = length, start
+        previous = day
+    return {"days": best, "start": best_start.isoformat() if best_start else None}
+
+
+def build_data(year):
+    logs = ReadingLog.objects.filter(date__year=year, page_difference__gt=0)
+    finished = (
+        Reading.objects.filter(current_status="F", date_finished__year=year)
+        .select_related("edition__title__author")
+        .order_by("date_finished", "id")
+    )
+    finished_books = [
+        {
+            "title": reading.edition.title.title,
+            "author": reading.edition.title.author.name,
+            "date_finished": reading.date_finished.isoformat(),
+            "days": (
+                (reading.date_finished - reading.date_started).days + 1
+                if reading.date_started
+                else None
+            ),
+            "pages": reading.edition.page_count or reading.edition.title.page_count,
+            "rating": reading.rating,
+        }
+        for reading in finished
+    ]
+
+    timed = [book for book in finished_books if book["days"]]
+    fastest = min(
+        timed, key=lambda book: (book["days"], -(book["pages"] or 0)), default=None
+    )
+
+    ratings = {}
+    for book in finished_books:
+        if book["rating"] is not None:
+            bucket = str(int(book["rating"]))
+            ratings[bucket] = ratings.get(bucket, 0) + 1
+
+    days = list(
+        logs.annotate(day=TruncDate("date"))
+        .values_list("day", flat=True)
+        .distinct()
+        .order_by("day")
+    )
+
+    return {
+        "year": year,
+        "pages_read": logs.aggregate(total=Sum("page_difference"))["total"] or 0,
+        "books_finished": len(finished_books),
+        "reading_days": len(days),
+        "longest_streak": longest_streak(days),
+        "fastest_read": fastest,
+        "top_genres": list(
+            logs.exclude(reading__edition__title__genres=None)
+            .values(name=F("reading__edition__title__genres__name"))
+            .annotate(pages=Sum("page_difference"))
+            .order_by("-pages", "name")[:TOP]
+        ),
+        "top_authors": list(
+            logs.values(name=F("reading__edition__title__author__name"))
+            .annotate(pages=Sum("page_difference"))
+            .order_by("-pages", "name")[:TOP]
+        ),
+        "ratings": dict(sorted(ratings.items(), key=lambda item: int(item[0]))),
+        "awarded_books": list(
+            BookAward.objects.filter(
+                book__editions__readings__in=finished.values("pk"), status="W"
+            )
+            .values(title=F("book__title"))
+            .annotate(awards=Count("id", distinct=True))
+            .order_by("-awards", "title")
+        ),
+        "finished": finished_books,
+    }
+
+
+def build(year, force=False):
+    """Store the report of ``year``, a final report is only rebuilt with ``force``"""
+    review = YearInReview.objects.filter(year=year).first()
+    if review and review.is_final and not force:
+        return review
+    data = build_data(year)
+    review, _ = YearInReview.objects.update_or_create(
+        year=year,
+        defaults={
+            "data": data,
+            "html": render_to_string(
+                "read/partials/year_review.html", {"review": data}
+            ),
+            "generated_at": timezone.now(),
+            "is_final": year < timezone.localdate().year,
+        },
+    )
+    return review
+
+
+def year_review(year):
+    """The stored report, built on first use, when the year just ended or when
+    the report of the current year is older than REFRESH"""
+    review = YearInReview.objects.filter(year=year).first()
+    if review is None:
+        return build(year)
+    if not review.is_final and (
+        year < timezone.localdate().year
+        or review.generated_at < timezone.now() - REFRESH
+    ):
+        review = build(year)
+    return review
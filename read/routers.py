@@ -0,0 +1,74 @@
+"""Send the reads of heavy analytics views to the read-only snapshot database"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SNAPSHOT_ALIAS = "snapshot"
+
+_snapshot_reads = ContextVar("read_snapshot_reads", default=False)
+
+
+@contextmanager
+def snapshot_reads():
+    """Route the reads inside the block to the snapshot database"""
+    token = _snapshot_reads.set(True)
+    try:
+        yield
+    finally:
+        _snapshot_reads.reset(token)
+
+
+def reads_from_snapshot(view):
+    """Decorate a read-only view, sync or async, to query the snapshot"""
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with snapshot_reads():
+                return await view(*args, **kwargs)
+
+    else:
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with snapshot_reads():
+                return view(*args, **kwargs)
+
+    return wrapper
+
+
+def snapshot_configured():
+    """Whether the snapshot is a database of its own, as a test mirror it is not"""
+    databases = connections.settings
+    return (
+        SNAPSHOT_ALIAS in databases
+        and databases[SNAPSHOT_ALIAS]["NAME"] != databases[DEFAULT_DB_ALIAS]["NAME"]
+    )
+
+
+class AnalyticsRouter:
+    """Reads go to the snapshot inside snapshot_reads(), writes always go to default"""
+
+    def db_for_read(self, model, **hints):
+        if _snapshot_reads.get() and snapshot_configured():
+            return SNAPSHOT_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # instances loaded from the snapshot would otherwise be saved to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, SNAPSHOT_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == SNAPSHOT_ALIAS:
+            return False
+        return None
@@ -0,0 +1,140 @@
+"""Full-text search over books, authors and editions with SQLite FTS5.
+
+Every author, book and edition is one row of the ``read_search`` virtual
+table. Its rowid encodes both the kind and the primary key
+(``id * 4 + kind``) so rows can be replaced and filtered without touching
+the unindexed columns. The signals in read.signals keep it in sync, and
+``manage.py rebuild_search_index`` recreates it from scratch.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+AUTHOR, BOOK, EDITION = 1, 2, 3
+KINDS = {"author": AUTHOR, "book": BOOK, "edition": EDITION}
+
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS read_search USING fts5(
+    title, author, series, subtitle, isbn,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# SELECT statements producing the rows of each kind, ``{where}`` narrows them down
+DOCUMENTS = {
+    AUTHOR: """
+        SELECT a.id * 4 + 1, '', a.name, '', '', ''
+        FROM read_author a
+        {where}
+    """,
+    BOOK: """
+        SELECT b.id * 4 + 2, b.title, a.name, coalesce(s.title, ''),
+            coalesce((SELECT group_concat(e.subtitle, ' ')
+                      FROM read_edition e WHERE e.title_id = b.id), ''),
+            coalesce((SELECT group_concat(replace(e.isbn, '-', ''), ' ')
+                      FROM read_edition e WHERE e.title_id = b.id), '')
+        FROM read_book b
+        JOIN read_author a ON a.id = b.author_id
+        LEFT JOIN read_series s ON s.id = b.series_id
+        {where}
+    """,
+    EDITION: """
+        SELECT e.id * 4 + 3, b.title, a.name, coalesce(s.title, ''),
+            coalesce(e.subtitle, ''), coalesce(replace(e.isbn, '-', ''), '')
+        FROM read_edition e
+        JOIN read_book b ON b.id = e.title_id
+        JOIN read_author a ON a.id = b.author_id
+        LEFT JOIN read_series s ON s.id = b.series_id
+        {where}
+    """,
+}
+INSERT = "INSERT INTO read_search(rowid, title, author, series, subtitle, isbn) "
+TABLES = {
+    AUTHOR: ("read_author", "a"),
+    BOOK: ("read_book", "b"),
+    EDITION: ("read_edition", "e"),
+}
+
+
+def enabled():
+    return connection.vendor == "sqlite"
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search(kind, query, limit=20):
+    """Return the ids of the best matching objects of a kind"""
+    expression = match_expression(query)
+    if not expression or not enabled():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid >> 2 FROM read_search "
+            "WHERE read_search MATCH %s AND (rowid & 3) = %s "
+            "ORDER BY rank LIMIT %s",
+            [expression, KINDS[kind], limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def matching_ids(kind, query):
+    """Subquery of all matching ids, to filter a queryset with ``pk__in``"""
+    return RawSQL(
+        "SELECT rowid >> 2 FROM read_search "
+        "WHERE read_search MATCH %s AND (rowid & 3) = %s",
+        [match_expression(query), KINDS[kind]],
+    )
+
+
+def reindex(kind, ids=None, column="id"):
+    """Replace the rows of the given objects, or of all objects of the kind.
+
+    ``column`` selects which column of the kind's main table ``ids`` refer to,
+    e.g. ``title_id`` to reindex all the editions of some books.
+    """
+    if not enabled() or (ids is not None and not ids):
+        return
+    kind = KINDS.get(kind, kind)
+    table, alias = TABLES[kind]
+    with connection.cursor() as cursor:
+        if ids is None:
+            cursor.execute("DELETE FROM read_search WHERE (rowid & 3) = %s", [kind])
+            cursor.execute(INSERT + DOCUMENTS[kind].format(where=""))
+            return
+        ids = list(ids)
+        placeholders = ", ".join(["%s"] * len(ids))
+        where = f"WHERE {alias}.{column} IN ({placeholders})"
+        cursor.execute(
+            "DELETE FROM read_search WHERE rowid IN "
+            f"(SELECT {alias}.id * 4 + {kind} FROM {table} {alias} {where})",
+            ids,
+        )
+        cursor.execute(INSERT + DOCUMENTS[kind].format(where=where), ids)
+
+
+def remove(kind, ids):
+    if not enabled():
+        return
+    kind = KINDS.get(kind, kind)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "DELETE FROM read_search WHERE rowid = %s",
+            [(pk * 4 + kind,) for pk in ids],
+        )
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS read_search")
+        cursor.execute(CREATE_TABLE)
+    for kind in (AUTHOR, BOOK, EDITION):
+        reindex(kind)
+    with connection.cursor() as cursor:
+        cursor.execute("INSERT INTO read_search(read_search) VALUES ('optimize')")
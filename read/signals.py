@@ -1,33 +1,396 @@
-from django.db.models.signals import post_save, post_delete
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_save,
+    post_delete,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
-from .models import ReadingLog
-from django.db import transaction
+from django.utils import timezone
+from . import search, tasks
+from .analytics import invalidate_analytics
+from .filters import invalidate_facets
+from .models import (
+    Author,
+    Book,
+    Edition,
+    Genre,
+    Reading,
+    ReadingLog,
+    Series,
+    YearInReview,
+    YearlyProgress,
+    add_rating_aggregates,
+)
+from .pace import invalidate_pace
+
+_state = threading.local()
+
+
+@contextmanager
+def muted_log_receivers():
+    """Skip the ReadingLog receivers below in this thread.
+
+    For bulk rewrites that keep every total, like compact_reading_logs, which
+    invalidates the caches itself once done.
+    """
+    _state.muted = True
+    try:
+        yield
+    finally:
+        _state.muted = False
+
+
+def unless_muted(function):
+    @wraps(function)
+    def receiver(sender, **kwargs):
+        if sender is ReadingLog and getattr(_state, "muted", False):
+            return
+        return function(sender, **kwargs)
+
+    return receiver
 
 
 @receiver(post_save, sender=ReadingLog)
-def update_subsequent_on_save(sender, instance, **kwargs):
+@unless_muted
+def update_subsequent_on_save(sender, instance, update_fields=None, **kwargs):
     """Handle updates to existing logs"""
-    instance.update_subsequent_logs()
+    if update_fields is not None and set(update_fields) == {"page_difference"}:
+        # saved by the recompute itself
+        return
+    since = instance.date
+    previous_date = getattr(instance, "_previous_date", None)
+    if previous_date is not None and previous_date < since:
+        since = previous_date
+    recompute_reading_after(instance, since)
 
 
 @receiver(post_delete, sender=ReadingLog)
+@unless_muted
 def update_after_delete(sender, instance, **kwargs):
-    # Find new previous log
-     with transaction.atomic():
-        prev_log = (
-            ReadingLog.objects.filter(reading=instance.reading)
-            .filter(date__lt=instance.date)
-            .order_by("-date")
-            .first()
+    recompute_reading_after(instance, instance.date)
+
+
+def recompute_reading_after(log, since):
+    """Queue a recompute of the logs following ``since``, when there are any"""
+    later_logs = ReadingLog.objects.filter(
+        reading=log.reading_id, date__gte=since
+    ).exclude(pk=log.pk)
+    if later_logs.exists():
+        tasks.enqueue(
+            "recompute_reading",
+            key=log.reading_id,
+            reading_id=log.reading_id,
+            since=since.isoformat(),
         )
 
-        # Update subsequent logs
-        if prev_log:
-            prev_log.update_subsequent_logs()
-        else:
-            # If no previous log, update from start
-            first_log = (
-                ReadingLog.objects.filter(reading=instance.reading).order_by("date").first()
+
+# Yearly progress counters
+# Every save remembers what the row counted for before the change, so the
+# counters can be moved by the difference instead of being re-aggregated.
+
+
+@receiver(pre_save, sender=ReadingLog)
+@unless_muted
+def remember_log_progress(sender, instance, **kwargs):
+    instance._previous_progress = None
+    if instance.pk:
+        previous = (
+            ReadingLog.objects.filter(pk=instance.pk)
+            .values("date", "page_difference")
+            .first()
+        )
+        if previous:
+            instance._previous_date = previous["date"]
+            previous_log = ReadingLog(**previous)
+            instance._previous_progress = (
+                previous_log.year,
+                previous_log.page_difference,
             )
-            if first_log:
-                first_log.update_subsequent_logs()
+
+
+@receiver(post_save, sender=ReadingLog)
+@unless_muted
+def count_log_progress(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_progress", None)
+    year = instance.year
+    if previous is None:
+        YearlyProgress.increment(year, pages=instance.page_difference)
+    elif previous[0] == year:
+        YearlyProgress.increment(year, pages=instance.page_difference - previous[1])
+    else:
+        YearlyProgress.increment(previous[0], pages=-previous[1])
+        YearlyProgress.increment(year, pages=instance.page_difference)
+
+
+@receiver(pre_delete, sender=ReadingLog)
+@unless_muted
+def remember_deleted_progress(sender, instance, **kwargs):
+    # the instance can predate a recompute of its page difference by a job
+    instance._previous_progress = None
+    previous = (
+        ReadingLog.objects.filter(pk=instance.pk)
+        .values("date", "page_difference")
+        .first()
+    )
+    if previous:
+        instance._previous_progress = (
+            ReadingLog(**previous).year,
+            previous["page_difference"],
+        )
+
+
+@receiver(post_delete, sender=ReadingLog)
+@unless_muted
+def uncount_log_progress(sender, instance, **kwargs):
+    year, pages = getattr(instance, "_previous_progress", None) or (
+        instance.year,
+        instance.page_difference,
+    )
+    YearlyProgress.increment(year, pages=-pages)
+
+
+@receiver(pre_save, sender=Reading)
+def remember_previous_reading(sender, instance, **kwargs):
+    instance._previous_finished_year = None
+    instance._previous_rating = (None, None)
+    instance._previous_taste = None
+    if instance.pk:
+        previous = (
+            Reading.objects.filter(pk=instance.pk)
+            .values("current_status", "date_finished", "edition_id", "rating")
+            .first()
+        )
+        if previous:
+            instance._previous_finished_year = Reading(
+                current_status=previous["current_status"],
+                date_finished=previous["date_finished"],
+            ).finished_year
+            instance._previous_rating = (previous["edition_id"], previous["rating"])
+            instance._previous_taste = taste(Reading(**previous))
+
+
+@receiver(post_save, sender=Reading)
+def count_finished_book(sender, instance, **kwargs):
+    previous_year = getattr(instance, "_previous_finished_year", None)
+    if previous_year != instance.finished_year:
+        YearlyProgress.increment(previous_year, books=-1)
+        YearlyProgress.increment(instance.finished_year, books=1)
+
+
+@receiver(post_delete, sender=Reading)
+def uncount_finished_book(sender, instance, **kwargs):
+    YearlyProgress.increment(instance.finished_year, books=-1)
+
+
+# Rating aggregates of editions and books
+
+
+@receiver(post_save, sender=Reading)
+def count_rating(sender, instance, **kwargs):
+    previous_edition, previous_rating = getattr(
+        instance, "_previous_rating", (None, None)
+    )
+    if (previous_edition, previous_rating) == (instance.edition_id, instance.rating):
+        return
+    if previous_rating is not None:
+        Edition.add_ratings(previous_edition, -previous_rating, -1)
+    if instance.rating is not None:
+        Edition.add_ratings(instance.edition_id, instance.rating, 1)
+
+
+@receiver(post_delete, sender=Reading)
+def uncount_rating(sender, instance, **kwargs):
+    if instance.rating is not None:
+        Edition.add_ratings(instance.edition_id, -instance.rating, -1)
+
+
+@receiver(pre_save, sender=Edition)
+def remember_edition_book(sender, instance, **kwargs):
+    instance._previous_ratings = None
+    if instance.pk:
+        instance._previous_ratings = (
+            Edition.objects.filter(pk=instance.pk)
+            .values_list("title_id", "rating_sum", "rating_count")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Edition)
+def move_edition_ratings(sender, instance, **kwargs):
+    """Move the ratings of an edition to its new book"""
+    previous = getattr(instance, "_previous_ratings", None)
+    if previous is None or previous[0] == instance.title_id:
+        return
+    previous_book_id, rating_sum, rating_count = previous
+    for book_id, sign in ((previous_book_id, -1), (instance.title_id, 1)):
+        add_rating_aggregates(
+            Book.objects.filter(pk=book_id), sign * rating_sum, sign * rating_count
+        )
+
+
+@receiver(post_save, sender=ReadingLog)
+@receiver(post_delete, sender=ReadingLog)
+@unless_muted
+def invalidate_log_pace(sender, instance, **kwargs):
+    invalidate_pace(instance.reading_id)
+
+
+@receiver(post_save, sender=Reading)
+def invalidate_reading_pace(sender, instance, **kwargs):
+    invalidate_pace(instance.id)
+
+
+ANALYTICS_MODELS = (Author, Book, Edition, Genre, Reading, ReadingLog, Series)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@unless_muted
+def invalidate_analytics_on_change(sender, **kwargs):
+    if sender in ANALYTICS_MODELS:
+        invalidate_analytics()
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def invalidate_analytics_on_genres(sender, **kwargs):
+    invalidate_analytics()
+
+
+# Cached admin list filter choices and counts
+
+FACET_MODELS = (Author, Book, Genre, ReadingLog)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@unless_muted
+def invalidate_facets_on_change(sender, **kwargs):
+    if sender in FACET_MODELS:
+        invalidate_facets(sender)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def invalidate_facets_on_genres(sender, **kwargs):
+    invalidate_facets(sender)
+
+
+# Full-text search index
+
+
+@receiver(post_save, sender=Author)
+def index_author(sender, instance, **kwargs):
+    search.reindex("author", [instance.id])
+    if not kwargs["created"]:
+        book_ids = list(instance.book_set.values_list("id", flat=True))
+        search.reindex("book", book_ids)
+        search.reindex("edition", book_ids, column="title_id")
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    search.reindex("book", [instance.id])
+    if not kwargs["created"]:
+        search.reindex("edition", [instance.id], column="title_id")
+
+
+@receiver(post_save, sender=Series)
+def index_series(sender, instance, **kwargs):
+    book_ids = list(instance.book_set.values_list("id", flat=True))
+    search.reindex("book", book_ids)
+    search.reindex("edition", book_ids, column="title_id")
+
+
+@receiver(pre_delete, sender=Series)
+def remember_series_books(sender, instance, **kwargs):
+    instance._book_ids = list(instance.book_set.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Series)
+def unindex_series(sender, instance, **kwargs):
+    book_ids = getattr(instance, "_book_ids", [])
+    search.reindex("book", book_ids)
+    search.reindex("edition", book_ids, column="title_id")
+
+
+@receiver(post_save, sender=Edition)
+def index_edition(sender, instance, **kwargs):
+    search.reindex("edition", [instance.id])
+    # the book row holds the subtitles and ISBNs of all its editions
+    book_ids = {instance.title_id}
+    previous = getattr(instance, "_previous_ratings", None)
+    if previous:
+        book_ids.add(previous[0])
+    search.reindex("book", book_ids)
+
+
+@receiver(post_delete, sender=Edition)
+def unindex_edition(sender, instance, **kwargs):
+    search.remove("edition", [instance.id])
+    search.reindex("book", [instance.title_id])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    search.remove("book", [instance.id])
+
+
+@receiver(post_delete, sender=Author)
+def unindex_author(sender, instance, **kwargs):
+    search.remove("author", [instance.id])
+
+
+# Year in review
+# Only the report of the current year follows the data, past ones are final.
+
+
+def rebuild_year_review(*years):
+    year = timezone.localdate().year
+    if (
+        year in years
+        and YearInReview.objects.filter(year=year, is_final=False).exists()
+    ):
+        tasks.enqueue("build_year_review", key=year, year=year)
+
+
+@receiver(post_save, sender=ReadingLog)
+@receiver(post_delete, sender=ReadingLog)
+@unless_muted
+def rebuild_year_review_on_log(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_progress", None)
+    rebuild_year_review(instance.year, previous[0] if previous else None)
+
+
+@receiver(post_save, sender=Reading)
+@receiver(post_delete, sender=Reading)
+def rebuild_year_review_on_reading(sender, instance, **kwargs):
+    rebuild_year_review(
+        instance.finished_year, getattr(instance, "_previous_finished_year", None)
+    )
+
+
+# Want to read recommendations
+# Ranked against the finished, rated readings, so only those changes matter.
+
+
+def taste(reading):
+    """What a reading adds to the taste profile of read.recommendations"""
+    if reading.current_status == "F" and reading.rating is not None:
+        return (reading.edition_id, reading.rating)
+    return None
+
+
+@receiver(post_save, sender=Reading)
+def refresh_recommendations_on_save(sender, instance, **kwargs):
+    if getattr(instance, "_previous_taste", None) != taste(instance):
+        tasks.enqueue("refresh_recommendations")
+
+
+@receiver(post_delete, sender=Reading)
+def refresh_recommendations_on_delete(sender, instance, **kwargs):
+    if taste(instance) is not None:
+        tasks.enqueue("refresh_recommendations")
@@ -0,0 +1,260 @@
+"""A small database-backed job queue for work that can run after the response.
+
+Tasks are registered with @task and queued with enqueue(). Jobs with the same
+key are merged while they wait, so a burst of saves leaves a single job. The
+run_tasks command, or with READ_TASKS_AUTOSTART a worker thread started by the
+web process on its first request, runs them on a thread pool. Without either
+they run inline, see eager().
+"""
+
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from read.models import Job, ReadingLog
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 5
+# running jobs older than this are assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=15)
+
+
+@dataclass(frozen=True)
+class Task:
+    function: Callable
+    merge: Callable | None = None
+
+
+TASKS: dict[str, Task] = {}
+
+
+def task(function=None, *, merge=None):
+    """Register a task, ``merge(queued, new)`` combines the arguments of two jobs
+    with the same key, by default the newest arguments win"""
+
+    def register(function):
+        TASKS[function.__name__] = Task(function, merge)
+        return function
+
+    return register(function) if function else register
+
+
+def eager():
+    """Whether enqueue() runs the task inline. READ_TASKS_EAGER decides, left
+    at None the jobs run inline unless the web process starts a worker."""
+    eager = getattr(settings, "READ_TASKS_EAGER", None)
+    if eager is None:
+        return not getattr(settings, "READ_TASKS_AUTOSTART", False)
+    return eager
+
+
+def enqueue(name, key=None, **arguments):
+    """Queue the task ``name``, merging it into a waiting job with the same key"""
+    spec = TASKS[name]
+    if eager():
+        spec.function(**arguments)
+        return
+    key = f"{name}:{key}" if key is not None else name
+    for _ in range(3):
+        queued = Job.objects.filter(key=key, status=Job.QUEUED).first()
+        if queued is None:
+            try:
+                with transaction.atomic():
+                    Job.objects.create(name=name, key=key, arguments=arguments)
+                break
+            except IntegrityError:
+                # another process queued the same key in the meantime
+                continue
+        if queued.created_at < timezone.now() - STALE_AFTER:
+            logger.warning(
+                "Job %s has waited since %s, is a worker running?",
+                key,
+                queued.created_at,
+            )
+        merged = spec.merge(queued.arguments, arguments) if spec.merge else arguments
+        if merged == queued.arguments:
+            break
+        if Job.objects.filter(pk=queued.pk, status=Job.QUEUED).update(arguments=merged):
+            break
+    transaction.on_commit(wake_worker)
+
+
+def claim_next():
+    """Mark the oldest runnable job as running and return it, None if idle.
+
+    Jobs whose key is already running wait, so the same reading is never
+    recomputed by two threads at once.
+    """
+    running = Job.objects.filter(status=Job.RUNNING).values("key")
+    candidates = (
+        Job.objects.filter(status=Job.QUEUED)
+        .exclude(key__in=running)
+        .order_by("id")
+        .values_list("pk", flat=True)[:5]
+    )
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    spec = TASKS.get(job.name)
+    try:
+        if spec is None:
+            raise LookupError(f"Unknown task {job.name}")
+        spec.function(**job.arguments)
+    except Exception:
+        logger.exception("Job %s failed", job.key)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=traceback.format_exc()
+        )
+    else:
+        job.delete()
+
+
+def requeue_stale():
+    """Put back the jobs left running by a worker that died"""
+    stale = Job.objects.filter(
+        status=Job.RUNNING, started_at__lt=timezone.now() - STALE_AFTER
+    )
+    for job in stale:
+        requeue(job)
+
+
+def requeue(job):
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(status=Job.QUEUED, error="")
+    except IntegrityError:
+        # a newer job with the same key is waiting, merge this one into it
+        enqueue(job.name, job.key.partition(":")[2] or None, **job.arguments)
+        job.delete()
+
+
+class Worker:
+    """Runs queued jobs on a thread pool until stopped"""
+
+    def __init__(self, threads=None, poll_interval=POLL_INTERVAL):
+        threads = threads or getattr(settings, "READ_TASKS_THREADS", 1)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="read-tasks")
+        self.slots = threading.Semaphore(threads)
+        self.poll_interval = poll_interval
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name="read-tasks-dispatcher", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.wake.set()
+        self.executor.shutdown(wait=True)
+
+    def run(self, until_idle=False):
+        requeue_stale()
+        while not self.stopping.is_set():
+            self.slots.acquire()
+            try:
+                job = claim_next()
+            except Exception:
+                # e.g. the job table is missing before the first migrate
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                self.slots.release()
+                if until_idle and self.idle():
+                    return
+                self.wake.wait(self.poll_interval)
+                self.wake.clear()
+                continue
+            self.executor.submit(self.run_job, job)
+
+    def run_job(self, job):
+        try:
+            run_job(job)
+        finally:
+            close_old_connections()
+            self.slots.release()
+            self.wake.set()
+
+    def idle(self):
+        return not Job.objects.filter(status__in=(Job.QUEUED, Job.RUNNING)).exists()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Start the in-process worker, once"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = Worker()
+            _worker.start()
+    return _worker
+
+
+def wake_worker():
+    """Tell the in-process worker that new jobs are waiting, if there is one"""
+    if _worker is not None:
+        _worker.wake.set()
+
+
+def start_worker_on_first_request(**kwargs):
+    """Connected by ReadConfig.ready() with READ_TASKS_AUTOSTART, so only the web
+    process runs a worker, never a management command or a shell. It picks up
+    the jobs left by the last process."""
+    request_started.disconnect(start_worker_on_first_request)
+    start_worker()
+
+
+# Tasks
+
+
+def earliest_since(queued, new):
+    since = min(queued["since"], new["since"], key=datetime.fromisoformat)
+    return {**new, "since": since}
+
+
+@task(merge=earliest_since)
+def recompute_reading(reading_id, since):
+    """Chain the page differences of a reading's logs on from ``since``"""
+    ReadingLog.recompute_page_differences(reading_id, datetime.fromisoformat(since))
+
+
+@task
+def build_year_review(year):
+    """Rebuild the stored year in review report of the current year"""
+    from read import review
+
+    review.build(year)
+
+
+@task
+def refresh_recommendations():
+    """Rank the want to read books against the finished, rated readings"""
+    from read import recommendations
+
+    recommendations.refresh()
@@ -1,3 +1,1416 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from read.models import (
+    Author,
+    Book,
+    Edition,
+    Genre,
+    Job,
+    Reading,
+    ReadingGoal,
+    ReadingLog,
+    Recommendation,
+    Series,
+    YearInReview,
+    YearlyProgress,
+)
+from read import (
+    analytics,
+    backup,
+    catalog,
+    feeds,
+    pace,
+    recommendations,
+    review,
+    search,
+    tasks,
+    timeline,
+    views,
+    warmup,
+)
+from read.admin import BookAdmin, ReadingLogAdmin, RecentLogsFormSet
+from read.leaderboards import rated_books
+from read.routers import (
+    AnalyticsRouter,
+    reads_from_snapshot,
+    snapshot_configured,
+    snapshot_reads,
+)
+from read.pagination import EstimatedCountPaginator, estimated_row_count
+from read.views import daily_totals
+
+# the file cache of the settings is shared with the running site
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class HotQueryIndexTests(TestCase):
+    """The dashboard's frequent queries must go through the index made for them.
+
+    The plans are taken from the queries the code runs, on an empty database.
+    """
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, function, index):
+        """Every query ``function`` runs has a step reading through ``index``, a
+        plain ``SCAN`` of the table or an automatic index would not name it"""
+        uses = re.compile(rf"^(SEARCH|SCAN) \w+ USING (COVERING )?INDEX {index}\b")
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        self.assertTrue(queries.captured_queries, "No query run")
+        for query in queries.captured_queries:
+            plan = self.query_plan(query["sql"])
+            self.assertTrue(
+                any(uses.match(step) for step in plan), f"{index} not used: {plan}"
+            )
+
+    def test_currently_reading(self):
+        for cursor in (None, "9"):
+            self.assertUsesIndex(
+                lambda: feeds.currently_reading(cursor),
+                "read_readin_current_44b8fe_idx",
+            )
+
+    def test_last_finished(self):
+        for cursor in (None, "2024-01-01,9"):
+            self.assertUsesIndex(
+                lambda: feeds.last_finished(cursor), "read_readin_current_d4f0fc_idx"
+            )
+
+    def test_want_to_read(self):
+        for cursor in (None, "9"):
+            self.assertUsesIndex(
+                lambda: feeds.want_to_read(cursor), "read_editio_status_73b685_idx"
+            )
+
+    def test_book_status(self):
+        book = create_edition(status="W").title
+        self.assertUsesIndex(lambda: book.status, "read_editio_title_i_f5a69f_idx")
+
+    def test_book_status_annotation(self):
+        books = BookAdmin(Book, admin.site).get_queryset(RequestFactory().get("/"))
+        self.assertUsesIndex(lambda: list(books), "read_editio_title_i_f5a69f_idx")
+
+    def test_daily_totals(self):
+        self.assertUsesIndex(
+            lambda: list(daily_totals()), "read_readinglog_progress_idx"
+        )
+
+    def test_recommended(self):
+        self.assertUsesIndex(
+            recommendations.recommended, "read_editio_status_73b685_idx"
+        )
+
+
+def create_edition(title="Book", author="Author", page_count=100, **fields):
+    author, _ = Author.objects.get_or_create(name=author, defaults={"country": "X"})
+    book = Book.objects.create(title=title, author=author, page_count=page_count)
+    return Edition.objects.create(title=book, format="P", **fields)
+
+
+def moment(year, month=1, day=1, hour=12):
+    return datetime(year, month, day, hour, tzinfo=timezone.get_current_timezone())
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=True)
+class YearlyProgressTests(TestCase):
+    """The counters follow every change without re-aggregating the logs"""
+
+    def setUp(self):
+        self.reading = Reading.objects.create(edition=create_edition())
+
+    def progress(self, year):
+        progress = YearlyProgress.objects.filter(year=year).first()
+        return (progress.pages_read, progress.books_finished) if progress else (0, 0)
+
+    def assertCountersMatchRebuild(self):
+        call_command("rebuild_yearly_progress", check=True, stdout=StringIO())
+
+    def test_logs_count_their_page_difference(self):
+        ReadingLog.objects.create(
+            reading=self.reading, pages_read=30, date=moment(2024)
+        )
+        ReadingLog.objects.create(
+            reading=self.reading, pages_read=50, date=moment(2024, 2)
+        )
+        self.assertEqual(self.progress(2024), (50, 0))
+        self.assertCountersMatchRebuild()
+
+    def test_editing_a_log_moves_the_difference(self):
+        log = ReadingLog.objects.create(
+            reading=self.reading, pages_read=30, date=moment(2024)
+        )
+        ReadingLog.objects.create(
+            reading=self.reading, pages_read=50, date=moment(2024, 2)
+        )
+        log.pages_read = 40
+        log.save()
+        self.assertEqual(self.progress(2024), (50, 0))
+        log.pages_read = 60
+        log.save()
+        # the later log read nothing new any more
+        self.assertEqual(self.progress(2024), (60, 0))
+        self.assertCountersMatchRebuild()
+
+    def test_moving_a_log_between_years(self):
+        log = ReadingLog.objects.create(
+            reading=self.reading, pages_read=30, date=moment(2023, 12, 31)
+        )
+        log.date = moment(2024, 1, 2)
+        log.save()
+        self.assertEqual(self.progress(2023), (0, 0))
+        self.assertEqual(self.progress(2024), (30, 0))
+        self.assertCountersMatchRebuild()
+
+    def test_deleting_a_log(self):
+        ReadingLog.objects.create(
+            reading=self.reading, pages_read=30, date=moment(2024)
+        )
+        log = ReadingLog.objects.create(
+            reading=self.reading, pages_read=80, date=moment(2024, 2)
+        )
+        log.delete()
+        self.assertEqual(self.progress(2024), (30, 0))
+        self.assertCountersMatchRebuild()
+
+    def test_finished_books(self):
+        self.reading.current_status = "F"
+        self.reading.date_finished = date(2023, 12, 30)
+        self.reading.save()
+        self.assertEqual(self.progress(2023), (0, 1))
+        self.reading.date_finished = date(2024, 1, 2)
+        self.reading.save()
+        self.assertEqual(self.progress(2023), (0, 0))
+        self.assertEqual(self.progress(2024), (0, 1))
+        self.reading.delete()
+        self.assertEqual(self.progress(2024), (0, 0))
+        self.assertCountersMatchRebuild()
+
+    def test_rebuild_repairs_drift(self):
+        ReadingLog.objects.create(
+            reading=self.reading, pages_read=30, date=moment(2024)
+        )
+        YearlyProgress.objects.filter(year=2024).update(pages_read=5)
+        with self.assertRaises(CommandError):
+            self.assertCountersMatchRebuild()
+        call_command("rebuild_yearly_progress", stdout=StringIO())
+        self.assertEqual(self.progress(2024), (30, 0))
+
+    def test_required_pace(self):
+        goal = ReadingGoal(year=2024, pages_target=400, books_target=4)
+        progress = YearlyProgress(year=2024, pages_read=100, books_finished=1)
+        today = date(2024, 12, 22)
+        with mock.patch("django.utils.timezone.localdate", return_value=today):
+            pace = goal.required_pace(progress)
+        self.assertEqual(pace["days_left"], 10)
+        self.assertEqual(pace["pages_left"], 300)
+        self.assertEqual(pace["pages_per_day"], 30)
+        self.assertEqual(pace["books_left"], 3)
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=True)
+class ReadingPaceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.reading = Reading.objects.create(
+            edition=create_edition(page_count=300),
+            date_started=self.today - timedelta(days=9),
+        )
+        now = timezone.now()
+        for days_ago, pages in ((8, 20), (4, 60), (0, 100)):
+            ReadingLog.objects.create(
+                reading=self.reading,
+                pages_read=pages,
+                date=now - timedelta(days=days_ago),
+            )
+
+    def test_projection(self):
+        paces = pace.compute_paces([self.reading])
+        self.assertEqual(
+            paces[self.reading.id],
+            {
+                "average": 10,
+                "velocity": 10,
+                "projected_finish": self.today + timedelta(days=20),
+                "percentage_complete": 33,
+            },
+        )
+
+    def test_projection_without_numpy(self):
+        expected = pace.compute_paces([self.reading])
+        with mock.patch.object(pace, "np", None):
+            self.assertEqual(pace.compute_paces([self.reading]), expected)
+
+    def test_python_regression(self):
+        arguments = ([1, 1, 1, 2, 2], [0, 1, 2, 0, 3], [0, 5, 20, 10, 40], [9] * 5)
+        self.assertEqual(
+            pace._regress_python(*arguments, 0), {1: (0, 20, 9, 10), 2: (0, 40, 9, 10)}
+        )
+        # only the logs after the cutoff count towards the slope
+        self.assertEqual(
+            pace._regress_python(*arguments, 1),
+            {1: (0, 20, 9, 15), 2: (0, 40, 9, None)},
+        )
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_numpy_and_python_regressions_agree(self):
+        arguments = ([1, 1, 1, 2, 2], [0, 1, 2, 0, 3], [0, 5, 20, 10, 40], [9] * 5, 0)
+        numpy_stats = pace._regress_numpy(*arguments)
+        python_stats = pace._regress_python(*arguments)
+        self.assertEqual(numpy_stats.keys(), python_stats.keys())
+        for reading_id, stats in numpy_stats.items():
+            self.assertEqual(stats[:3], python_stats[reading_id][:3])
+            self.assertAlmostEqual(stats[3], python_stats[reading_id][3])
+
+    def test_reading_without_logs(self):
+        reading = Reading.objects.create(edition=create_edition(title="Other"))
+        self.assertIsNone(pace.compute_paces([reading])[reading.id]["average"])
+
+    def test_new_log_invalidates_the_cached_pace(self):
+        cached = pace.reading_paces([self.reading])[self.reading.id]
+        ReadingLog.objects.create(reading=self.reading, pages_read=300)
+        updated = pace.reading_paces([self.reading])[self.reading.id]
+        self.assertEqual(cached["percentage_complete"], 33)
+        self.assertEqual(updated["percentage_complete"], 100)
+        self.assertEqual(updated["projected_finish"], self.today)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class TimelineTests(TestCase):
+    def test_downsample_keeps_the_ends_and_a_spike(self):
+        points = [(x, 1000 if x == 47 else x) for x in range(100)]
+        kept = list(timeline.downsample(iter(points), len(points), 12))
+        self.assertEqual(len(kept), 12)
+        self.assertEqual(kept[0], points[0])
+        self.assertEqual(kept[-1], points[-1])
+        self.assertEqual([x for x, _ in kept], sorted(x for x, _ in kept))
+        self.assertIn((47, 1000), kept)
+
+    def test_downsample_below_threshold_returns_everything(self):
+        points = [(x, x) for x in range(5)]
+        self.assertEqual(list(timeline.downsample(iter(points), 5, 10)), points)
+
+    @override_settings(READ_TASKS_EAGER=True)
+    def test_endpoint(self):
+        reading = Reading.objects.create(edition=create_edition(page_count=500))
+        start = moment(2024)
+        for day in range(30):
+            ReadingLog.objects.create(
+                reading=reading, pages_read=day * 10, date=start + timedelta(days=day)
+            )
+        url = reverse("read:reading-timeline", args=[reading.id])
+        data = self.client.get(url, {"points": 10}).json()
+        self.assertEqual(len(data), 10)
+        self.assertEqual(data[0], {"date": start.isoformat(), "value": 0})
+        self.assertEqual(data[-1]["value"], 290)
+        self.assertEqual(len(self.client.get(url).json()), 30)
+        self.assertEqual(self.client.get(url, {"points": 2}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"points": "x"}).status_code, 400)
+        missing = reverse("read:reading-timeline", args=[reading.id + 1])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=True)
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        fantasy = Genre.objects.create(name="Fantasy")
+        horror = Genre.objects.create(name="Horror")
+        edition = create_edition(page_count=300, language="en")
+        edition.title.genres.add(fantasy, horror)
+        audio = create_edition(title="Audio", author="Other", page_count=300)
+        audio.format = "A"
+        audio.save()
+        self.reading = Reading.objects.create(edition=edition)
+        for when, pages in ((moment(2024, 1, 5), 40), (moment(2024, 2, 5), 100)):
+            ReadingLog.objects.create(reading=self.reading, pages_read=pages, date=when)
+        self.audio_reading = Reading.objects.create(edition=audio)
+        ReadingLog.objects.create(
+            reading=self.audio_reading, pages_read=30, date=moment(2024, 1, 6)
+        )
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_pages_per_genre_per_month(self):
+        self.assertCountEqual(
+            analytics.pages_per_genre_per_month(),
+            [
+                {"genre": "Fantasy", "month": "2024-01", "pages": 40},
+                {"genre": "Fantasy", "month": "2024-02", "pages": 60},
+                {"genre": "Horror", "month": "2024-01", "pages": 40},
+                {"genre": "Horror", "month": "2024-02", "pages": 60},
+            ],
+        )
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_reading_speed_counts_each_log_once(self):
+        self.assertCountEqual(
+            analytics.reading_speed("format"),
+            [
+                {
+                    "format": "print",
+                    "pages": 100,
+                    "reading_days": 2,
+                    "pages_per_day": 50,
+                },
+                {
+                    "format": "audio",
+                    "pages": 30,
+                    "reading_days": 1,
+                    "pages_per_day": 30,
+                },
+            ],
+        )
+        with self.assertRaises(ValueError):
+            analytics.reading_speed("colour")
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_results_follow_new_logs(self):
+        analytics.reading_speed("author")
+        ReadingLog.objects.create(
+            reading=self.audio_reading, pages_read=90, date=moment(2024, 1, 7)
+        )
+        speeds = {row["author"]: row for row in analytics.reading_speed("author")}
+        self.assertEqual(speeds["Other"]["pages"], 90)
+        self.assertEqual(speeds["Other"]["reading_days"], 2)
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_lost_version_key_does_not_reuse_old_columns(self):
+        columns = analytics.load_columns()
+        cache.clear()
+        self.assertNotEqual(analytics.data_version(), columns.version)
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_endpoint(self):
+        response = self.client.get(reverse("read:analytics-speed", args=["language"]))
+        self.assertEqual(
+            {row["language"] for row in response.json()}, {"en", "Unknown"}
+        )
+        response = self.client.get(reverse("read:analytics-speed", args=["colour"]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_columns_need_numpy(self):
+        with mock.patch.object(analytics, "np", None):
+            with self.assertRaises(ImproperlyConfigured):
+                analytics.load_columns()
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=True)
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.first = create_edition(title="First")
+        self.second = create_edition(title="Second", author="Other")
+        self.third = create_edition(title="Third")
+
+    def rate(self, edition, *ratings):
+        return [
+            Reading.objects.create(edition=edition, rating=rating) for rating in ratings
+        ]
+
+    def test_aggregates_follow_the_readings(self):
+        reading, _ = self.rate(self.first, 8, 6)
+        book = Book.objects.get(pk=self.first.title_id)
+        self.assertEqual((book.rating_count, book.rating_average), (2, 7))
+        reading.rating = 10
+        reading.save()
+        book.refresh_from_db()
+        self.assertEqual(book.average_rating, 8)
+        reading.delete()
+        book.refresh_from_db()
+        self.assertEqual((book.rating_count, book.rating_average), (1, 6))
+
+    def test_moving_a_reading_moves_its_rating(self):
+        (reading,) = self.rate(self.first, 9)
+        reading.edition = self.second
+        reading.save()
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertIsNone(self.first.rating_average)
+        self.assertEqual(self.second.rating_average, 9)
+
+    def test_stale_instance_does_not_overwrite_the_aggregates(self):
+        stale = Edition.objects.get(pk=self.first.pk)
+        self.rate(self.first, 7)
+        stale.subtitle = "Renamed"
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual((stale.rating_count, stale.rating_average), (1, 7))
+
+    def test_leaderboard_ordering(self):
+        self.rate(self.first, 8)
+        self.rate(self.second, 9)
+        self.rate(self.third, 4)
+        create_edition(title="Unrated")
+        self.assertEqual(
+            [book.title for book in rated_books()], ["Second", "First", "Third"]
+        )
+        self.assertEqual(
+            [book.title for book in rated_books(worst=True, limit=2)],
+            ["Third", "First"],
+        )
+        author = Author.objects.get(name="Author")
+        self.assertEqual(
+            [book.title for book in rated_books(author=author)], ["First", "Third"]
+        )
+
+    def test_leaderboard_endpoint(self):
+        self.rate(self.first, 8, 9)
+        self.rate(self.second, 3)
+        url = reverse("read:leaderboard")
+        data = self.client.get(url, {"order": "worst"}).json()
+        self.assertEqual([row["title"] for row in data], ["Second", "First"])
+        self.assertEqual(data[1]["rating"], 8.5)
+        self.assertEqual(data[1]["ratings"], 2)
+        self.assertEqual(self.client.get(url, {"limit": "x"}).status_code, 400)
+        for limit in (0, -1):
+            with self.subTest(limit=limit):
+                response = self.client.get(url, {"limit": limit})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.client.get(url, {"limit": 1}).json()), 1)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.edition = create_edition(
+            title="Germinal", author="Émile Zola", isbn="978-2-07-036002-4"
+        )
+        self.book = self.edition.title
+
+    def test_prefix_matches(self):
+        for query in ("germ", "emile", "zol germ", "9782070360024"):
+            with self.subTest(query=query):
+                self.assertEqual(search.search("book", query), [self.book.id])
+        self.assertEqual(search.search("author", "zola"), [self.book.author_id])
+        self.assertEqual(search.search("edition", "germinal"), [self.edition.id])
+        self.assertEqual(search.search("book", "nana"), [])
+        self.assertEqual(search.search("book", "*"), [])
+
+    def test_index_follows_renames(self):
+        series = Series.objects.create(title="Rougon", author=self.book.author)
+        self.book.series = series
+        self.book.series_order = 13
+        self.book.save()
+        self.assertEqual(search.search("book", "rougon"), [self.book.id])
+        series.title = "Macquart"
+        series.save()
+        self.assertEqual(search.search("edition", "macquart"), [self.edition.id])
+        author = self.book.author
+        author.name = "Zola"
+        author.save()
+        self.assertEqual(search.search("book", "emile"), [])
+
+    def test_deleted_rows_leave_the_index(self):
+        self.edition.delete()
+        self.assertEqual(search.search("edition", "germinal"), [])
+        self.assertEqual(search.search("book", "9782070360024"), [])
+        self.book.delete()
+        self.assertEqual(search.search("book", "germinal"), [])
+
+    def test_rebuild_and_endpoint(self):
+        call_command("rebuild_search_index", stdout=StringIO())
+        data = self.client.get(reverse("read:search"), {"q": "germ"}).json()
+        self.assertEqual([row["title"] for row in data], ["Germinal"])
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=True)
+class AdminPaginationTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+        self.reading = Reading.objects.create(edition=create_edition())
+        self.logs = [
+            ReadingLog.objects.create(
+                reading=self.reading, pages_read=day, date=moment(2024, 1, day + 1)
+            )
+            for day in range(5)
+        ]
+        # rated readings are in a partial index, unrated ones are not
+        Reading.objects.create(edition=self.reading.edition, rating=5)
+        Reading.objects.create(edition=self.reading.edition)
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def test_estimate_ignores_partial_indexes(self):
+        self.assertIsNone(estimated_row_count(Reading))
+        self.analyze()
+        self.assertEqual(estimated_row_count(Reading), 3)
+        # only 4 of the logs read new pages
+        self.assertEqual(estimated_row_count(ReadingLog), 5)
+
+    def test_estimates_are_off_by_default(self):
+        self.analyze()
+        Reading.objects.create(edition=self.reading.edition)
+        readings = Reading.objects.order_by("pk")
+        self.assertEqual(EstimatedCountPaginator(readings, 2).count, 4)
+
+    @override_settings(READ_ESTIMATED_COUNTS=True)
+    def test_paginator_counts_filtered_querysets(self):
+        self.analyze()
+        Reading.objects.create(edition=self.reading.edition)
+        readings = Reading.objects.order_by("pk")
+        # the stale statistics for the whole table, a real count when filtered
+        self.assertEqual(EstimatedCountPaginator(readings, 2).count, 3)
+        unrated = readings.filter(rating__isnull=True)
+        self.assertEqual(EstimatedCountPaginator(unrated, 2).count, 3)
+
+    @override_settings(READ_ESTIMATED_COUNTS=True)
+    def test_estimate_within_one_page_is_counted(self):
+        self.analyze()
+        for number in range(5):
+            create_edition(title=f"Book {number}")
+        url = reverse("admin:read_book_changelist")
+        with mock.patch.object(BookAdmin, "list_per_page", 2):
+            changelist = self.client.get(url).context["cl"]
+        # the statistics still say 1 book, which would list all 6 on one page
+        self.assertEqual(changelist.result_count, 6)
+        self.assertEqual(len(changelist.result_list), 2)
+        self.assertEqual(changelist.paginator.num_pages, 3)
+
+    def test_reading_log_changelist_pages_with_a_cursor(self):
+        url = reverse("admin:read_readinglog_changelist")
+        seen = []
+        with mock.patch.object(ReadingLogAdmin, "list_per_page", 2):
+            response = self.client.get(url)
+            while True:
+                changelist = response.context["cl"]
+                seen += [log.pk for log in changelist.result_list]
+                if not changelist.next_url:
+                    break
+                response = self.client.get(url + changelist.next_url)
+        self.assertEqual(seen, [log.pk for log in reversed(self.logs)])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CachedFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+        self.genre = Genre.objects.create(name="Fantasy")
+        self.book = create_edition(title="Dune").title
+        self.book.language = "en"
+        self.book.save()
+        self.url = reverse("admin:read_book_changelist")
+
+    def filters(self):
+        changelist = self.client.get(self.url).context["cl"]
+        return changelist, {spec.field_path: spec for spec in changelist.filter_specs}
+
+    def facet_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.filters()
+        return [query["sql"] for query in queries if "GROUP BY" in query["sql"]]
+
+    def test_facets_are_computed_once(self):
+        self.assertTrue(self.facet_queries())
+        self.assertEqual(self.facet_queries(), [])
+
+    def test_saves_invalidate_the_choices(self):
+        self.filters()
+        Book.objects.create(title="Ubik", author=self.book.author, language="fr")
+        _, specs = self.filters()
+        self.assertEqual(list(specs["language"].lookup_choices), ["en", "fr"])
+
+    def test_genre_changes_invalidate_the_counts(self):
+        changelist, specs = self.filters()
+        counts = specs["genres"].get_facet_queryset(changelist)
+        self.assertEqual(counts[f"{self.genre.pk}__c"], 0)
+        self.book.genres.add(self.genre)
+        changelist, specs = self.filters()
+        counts = specs["genres"].get_facet_queryset(changelist)
+        self.assertEqual(counts[f"{self.genre.pk}__c"], 1)
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=True)
+class RecentLogsInlineTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+        self.reading = Reading.objects.create(edition=create_edition(page_count=300))
+        self.logs = [
+            ReadingLog.objects.create(
+                reading=self.reading, pages_read=pages, date=moment(2024, 1, day)
+            )
+            for day, pages in ((1, 10), (2, 20), (3, 30))
+        ]
+        self.url = reverse("admin:read_reading_change", args=[self.reading.pk])
+
+    def post_data(self, logs):
+        data = {
+            "edition": self.reading.edition_id,
+            "current_status": "R",
+            "logs-TOTAL_FORMS": len(logs),
+            "logs-INITIAL_FORMS": len(logs),
+            "logs-MIN_NUM_FORMS": 0,
+            "logs-MAX_NUM_FORMS": 1000,
+        }
+        for i, log in enumerate(logs):
+            date = timezone.localtime(log.date)
+            data |= {
+                f"logs-{i}-id": log.pk,
+                f"logs-{i}-reading": self.reading.pk,
+                f"logs-{i}-date_0": date.date().isoformat(),
+                f"logs-{i}-date_1": date.strftime("%H:%M:%S"),
+                f"logs-{i}-pages_read": log.pages_read,
+                f"logs-{i}-percentage_read": "",
+            }
+        return data
+
+    def test_only_recent_logs_are_rendered(self):
+        with mock.patch.object(RecentLogsFormSet, "recent_count", 2):
+            response = self.client.get(self.url)
+            formset = response.context["inline_admin_formsets"][0].formset
+            self.assertEqual(
+                [form.instance for form in formset.initial_forms], self.logs[:0:-1]
+            )
+            self.assertTrue(formset.older_logs_url)
+
+    def test_edit_survives_a_log_added_meanwhile(self):
+        with mock.patch.object(RecentLogsFormSet, "recent_count", 2):
+            rendered = self.logs[:0:-1]
+            data = self.post_data(rendered)
+            # a log added between rendering and submitting the form
+            ReadingLog.objects.create(
+                reading=self.reading, pages_read=40, date=moment(2024, 1, 4)
+            )
+            data["logs-1-pages_read"] = 25
+            response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+        self.logs[1].refresh_from_db()
+        self.assertEqual(self.logs[1].pages_read, 25)
+        self.assertEqual(self.reading.logs.count(), 4)
+
+    def test_existing_rows_are_validated(self):
+        with mock.patch.object(RecentLogsFormSet, "recent_count", 2):
+            data = self.post_data(self.logs[:0:-1])
+            data["logs-0-percentage_read"] = 50
+            response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["inline_admin_formsets"][0].formset.errors)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class FeedTests(TestCase):
+    def setUp(self):
+        edition = create_edition()
+        # ties on the date are broken by the id
+        self.finished = [
+            Reading.objects.create(
+                edition=edition,
+                current_status="F",
+                date_finished=date(2024, 1, 1) + timedelta(days=i // 2),
+            )
+            for i in range(7)
+        ]
+        Reading.objects.create(edition=edition, current_status="F")
+
+    def pages(self, feed, **kwargs):
+        pages, cursor = [], None
+        while True:
+            rows, cursor = feed(cursor, **kwargs)
+            pages.append(rows)
+            if cursor is None:
+                return pages
+
+    def test_last_finished_pages_through_every_reading_once(self):
+        pages = self.pages(feeds.last_finished, size=3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        expected = sorted(
+            self.finished, key=lambda r: (r.date_finished, r.pk), reverse=True
+        )
+        self.assertEqual([reading for page in pages for reading in page], expected)
+
+    def test_exact_last_page_has_no_cursor(self):
+        rows, cursor = feeds.currently_reading(size=8)
+        self.assertEqual((rows, cursor), ([], None))
+        self.assertEqual([len(page) for page in self.pages(feeds.want_to_read)], [1])
+
+    def test_malformed_cursor_restarts(self):
+        first, _ = feeds.last_finished(size=3)
+        for cursor in ("garbage", "2024-01-01", "x,1"):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(feeds.last_finished(cursor, size=3)[0], first)
+
+    def test_feed_view_links_the_next_page(self):
+        for reading in self.finished[:3]:
+            reading.pk = None
+            reading.save()
+        url = reverse("read:last-finished-feed")
+        response = self.client.get(url)
+        readings = response.context["last_finished"]
+        self.assertEqual(len(readings), feeds.PAGE_SIZE)
+        self.assertContains(response, f"{url}?cursor=")
+        response = self.client.get(
+            url, {"cursor": response.context["last_finished_cursor"]}
+        )
+        self.assertEqual(len(response.context["last_finished"]), 2)
+        self.assertIsNone(response.context["last_finished_cursor"])
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=True)
+class CompactReadingLogsTests(TestCase):
+    def setUp(self):
+        self.reading = Reading.objects.create(
+            edition=create_edition(page_count=300), date_started=date(2023, 6, 1)
+        )
+        for day, hour, pages in (
+            (1, 9, 10),
+            (1, 12, 20),
+            (1, 18, 35),
+            (2, 10, 50),
+            (2, 20, 80),
+            (3, 8, 90),
+        ):
+            ReadingLog.objects.create(
+                reading=self.reading, pages_read=pages, date=moment(2023, 6, day, hour)
+            )
+        self.reading.current_status = "F"
+        self.reading.date_finished = date(2023, 6, 3)
+        self.reading.save()
+
+    def compact(self, **options):
+        out = StringIO()
+        call_command(
+            "compact_reading_logs", older_than=30, no_vacuum=True, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def totals(self):
+        return [(row["date_trunc"], row["total"]) for row in daily_totals()]
+
+    def test_one_log_per_day_with_the_same_totals(self):
+        totals = self.totals()
+        progress = YearlyProgress.objects.get(year=2023).pages_read
+        self.assertIn("Removed 3 log(s), 2 daily summaries updated", self.compact())
+        self.assertEqual(
+            list(self.reading.logs.values_list("pages_read", flat=True)), [35, 80, 90]
+        )
+        self.assertEqual(self.totals(), totals)
+        self.assertEqual(YearlyProgress.objects.get(year=2023).pages_read, progress)
+        self.assertFalse(Job.objects.exists())
+        call_command("rebuild_yearly_progress", check=True, stdout=StringIO())
+
+    def test_receivers_run_again_afterwards(self):
+        self.compact()
+        self.reading.logs.last().delete()
+        self.assertEqual(YearlyProgress.objects.get(year=2023).pages_read, 80)
+
+    def test_dry_run(self):
+        self.assertIn("Would remove 3 log(s) and update 2", self.compact(dry_run=True))
+        self.assertEqual(self.reading.logs.count(), 6)
+
+    def test_recent_and_unfinished_readings_are_kept(self):
+        self.reading.current_status = "R"
+        self.reading.save()
+        self.assertIn("Removed 0 log(s)", self.compact())
+        with self.assertRaises(CommandError):
+            call_command("compact_reading_logs", stdout=StringIO())
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BackupTests(TransactionTestCase):
+    """The backup API waits for the transaction a TestCase would keep open"""
+
+    def setUp(self):
+        create_edition(title="Backed up")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def journal_mode(self, path):
+        database = sqlite3.connect(path)
+        try:
+            return database.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            database.close()
+
+    def test_snapshot_is_one_self_contained_file(self):
+        path = backup.snapshot(self.directory / "db-1.sqlite3", pages=1, sleep=0)
+        self.assertEqual(backup.integrity_errors(path), [])
+        self.assertEqual(self.journal_mode(path), "delete")
+        database = sqlite3.connect(path)
+        titles = database.execute("SELECT title FROM read_book").fetchall()
+        database.close()
+        self.assertEqual(titles, [("Backed up",)])
+        self.assertEqual([p.name for p in self.directory.iterdir()], ["db-1.sqlite3"])
+
+    def test_rotation_ignores_side_files(self):
+        for stamp in ("20240101", "20240102", "20240103"):
+            backup.snapshot(self.directory / f"db-{stamp}.sqlite3", sleep=0)
+        backup.compress(self.directory / "db-20240103.sqlite3")
+        for side_file in ("db-20240101.sqlite3-wal", "db-20240102.sqlite3-shm"):
+            (self.directory / side_file).touch()
+        (self.directory / "other-20240101.sqlite3").touch()
+        removed = backup.rotate(self.directory, "db", keep=2)
+        self.assertEqual([path.name for path in removed], ["db-20240101.sqlite3"])
+        self.assertEqual(
+            sorted(path.name for path in self.directory.iterdir()),
+            [
+                "db-20240102.sqlite3",
+                "db-20240102.sqlite3-shm",
+                "db-20240103.sqlite3.gz",
+                "other-20240101.sqlite3",
+            ],
+        )
+
+    def test_command_keeps_and_verifies_snapshots(self):
+        for stale in ("db-20000101-000000.sqlite3", "db-20000102-000000.sqlite3"):
+            backup.snapshot(self.directory / stale, sleep=0)
+            (self.directory / f"{stale}-wal").touch()
+        with mock.patch.dict(connection.settings_dict, {"NAME": "db.sqlite3"}):
+            call_command(
+                "backup_db",
+                output_dir=self.directory,
+                keep=2,
+                compress=True,
+                sleep=0,
+                stdout=StringIO(),
+            )
+        kept = backup.snapshots(self.directory, "db")
+        self.assertEqual(len(kept), 2)
+        self.assertEqual(kept[0].name, "db-20000102-000000.sqlite3")
+        self.assertTrue(kept[1].name.endswith(".sqlite3.gz"))
+        self.assertFalse((self.directory / "db-20000101-000000.sqlite3-wal").exists())
+
+        # relative paths, compressed or not
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory)
+        for path in kept:
+            out = StringIO()
+            call_command("backup_db", verify=path.name, stdout=out)
+            self.assertIn("is intact", out.getvalue())
+        Path("broken.sqlite3").write_bytes(b"not a database" * 100)
+        with self.assertRaises(CommandError):
+            call_command("backup_db", verify="broken.sqlite3", stdout=StringIO())
+
+    def test_refresh_snapshot(self):
+        target = self.directory / "snapshot.sqlite3"
+        target.write_bytes(b"")
+        with self.settings(SNAPSHOT_PATH=str(target)):
+            call_command("backup_db", refresh_snapshot=True, sleep=0, stdout=StringIO())
+        self.assertEqual(backup.integrity_errors(target), [])
+        self.assertEqual([p.name for p in self.directory.iterdir()], [target.name])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SnapshotRoutingTests(TestCase):
+    def setUp(self):
+        # under test the snapshot mirrors the default database
+        patcher = mock.patch("read.routers.snapshot_configured", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_test_mirror_is_not_a_separate_snapshot(self):
+        self.assertFalse(snapshot_configured())
+
+    def test_reads_inside_the_block_go_to_the_snapshot(self):
+        self.assertEqual(Reading.objects.all().db, "default")
+        with snapshot_reads():
+            self.assertEqual(Reading.objects.all().db, "snapshot")
+            self.assertEqual(AnalyticsRouter().db_for_write(Reading), "default")
+        self.assertEqual(Reading.objects.all().db, "default")
+
+    def test_decorated_views(self):
+        @reads_from_snapshot
+        def sync_view():
+            return ReadingLog.objects.all().db
+
+        @reads_from_snapshot
+        async def async_view():
+            return ReadingLog.objects.all().db
+
+        self.assertEqual(sync_view(), "snapshot")
+        self.assertEqual(asyncio.run(async_view()), "snapshot")
+        self.assertEqual(ReadingLog.objects.all().db, "default")
+
+    def test_snapshot_is_never_migrated(self):
+        router = AnalyticsRouter()
+        self.assertIs(router.allow_migrate("snapshot", "read"), False)
+        self.assertIsNone(router.allow_migrate("default", "read"))
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.reading = Reading.objects.create(edition=create_edition(page_count=300))
+        self.logs = [
+            ReadingLog.objects.create(
+                reading=self.reading, pages_read=pages, date=moment(2024, 1, day)
+            )
+            for day, pages in ((1, 10), (2, 30), (3, 60))
+        ]
+
+    def test_jobs_with_the_same_key_are_merged(self):
+        self.logs[2].pages_read = 70
+        self.logs[2].save()
+        self.logs[0].pages_read = 20
+        self.logs[0].save()
+        job = Job.objects.get()
+        self.assertEqual(job.key, f"recompute_reading:{self.reading.pk}")
+        self.assertEqual(job.arguments["since"], self.logs[0].date.isoformat())
+
+    def test_job_recomputes_the_later_logs(self):
+        self.logs[0].pages_read = 20
+        self.logs[0].save()
+        tasks.run_job(tasks.claim_next())
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(
+            list(self.reading.logs.values_list("page_difference", flat=True)),
+            [20, 10, 30],
+        )
+
+    def test_queueing_never_starts_a_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.logs[0].delete()
+        self.assertTrue(Job.objects.exists())
+        self.assertIsNone(tasks._worker)
+        self.assertNotIn(
+            "read-tasks-dispatcher", [thread.name for thread in threading.enumerate()]
+        )
+
+    def test_failed_jobs_keep_their_error(self):
+        def broken():
+            raise RuntimeError("boom")
+
+        with mock.patch.dict(tasks.TASKS, {"broken": tasks.Task(broken)}):
+            tasks.enqueue("broken")
+            job = tasks.claim_next()
+            with self.assertLogs("read.tasks", "ERROR"):
+                tasks.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn("RuntimeError: boom", job.error)
+
+    def test_long_waiting_jobs_are_reported(self):
+        self.logs[1].save()
+        Job.objects.update(created_at=timezone.now() - tasks.STALE_AFTER * 2)
+        with self.assertLogs("read.tasks", "WARNING"):
+            self.logs[0].save()
+
+    @override_settings(READ_TASKS_EAGER=None)
+    def test_jobs_run_inline_without_a_worker(self):
+        self.assertTrue(tasks.eager())
+        self.logs[0].pages_read = 20
+        self.logs[0].save()
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(
+            list(self.reading.logs.values_list("page_difference", flat=True)),
+            [20, 10, 30],
+        )
+        with self.settings(READ_TASKS_AUTOSTART=True):
+            self.assertFalse(tasks.eager())
+
+    def test_running_keys_wait_and_stale_jobs_are_requeued(self):
+        self.logs[0].save()
+        running = tasks.claim_next()
+        self.logs[1].pages_read = 40
+        self.logs[1].save()
+        self.assertIsNone(tasks.claim_next())
+        Job.objects.filter(pk=running.pk).update(
+            started_at=timezone.now() - tasks.STALE_AFTER * 2
+        )
+        tasks.requeue_stale()
+        # merged into the job queued meanwhile
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.arguments["since"], self.logs[0].date.isoformat())
+
+
+@override_settings(CACHES=LOCAL_CACHES, READ_TASKS_EAGER=False)
+class RunTasksCommandTests(TransactionTestCase):
+    """The worker threads use connections of their own, outside a TestCase"""
+
+    def test_run_tasks_until_idle(self):
+        reading = Reading.objects.create(edition=create_edition(page_count=300))
+        first = ReadingLog.objects.create(
+            reading=reading, pages_read=10, date=moment(2024, 1, 1)
+        )
+        ReadingLog.objects.create(
+            reading=reading, pages_read=30, date=moment(2024, 1, 2)
+        )
+        first.pages_read = 25
+        first.save()
+        out = StringIO()
+        call_command("run_tasks", once=True, threads=2, stdout=out)
+        self.assertIn("Done", out.getvalue())
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(
+            list(reading.logs.values_list("page_difference", flat=True)), [25, 5]
+        )
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CatalogImportTests(TestCase):
+    records = [
+        {"type": "/type/author", "key": "/authors/A1", "name": "Frank  HERBERT"},
+        {"type": "/type/author", "key": "/authors/A2", "name": "Ursula K. Le Guin"},
+        {
+            "type": {"key": "/type/work"},
+            "key": "/works/W1",
+            "title": "Dune",
+            "authors": [{"author": {"key": "/authors/A1"}}],
+            "subjects": ["Science Fiction", "Deserts"],
+            "first_publish_date": "August 1965",
+        },
+        {
+            "type": "/type/work",
+            "key": "/works/W2",
+            "title": "The Dispossessed",
+            "authors": [{"author": {"key": "/authors/A2"}}],
+        },
+        {
+            "type": "/type/edition",
+            "key": "/books/E1",
+            "works": [{"key": "/works/W1"}],
+            "isbn_10": ["0-441-17271-7"],
+            "number_of_pages": 412,
+            "physical_format": "Paperback",
+        },
+        {
+            "type": "/type/edition",
+            "key": "/books/E2",
+            "works": [{"key": "/works/W1"}],
+            "isbn_13": ["9780441172719"],
+        },
+        {
+            "type": "/type/edition",
+            "key": "/books/E3",
+            "works": [{"key": "/works/W2"}],
+            "physical_format": "Audio CD",
+            "languages": [{"key": "/languages/eng"}],
+        },
+    ]
+
+    def setUp(self):
+        Author.objects.create(name="Frank Herbert", country="US")
+        Genre.objects.create(name="science fiction")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def dump(self, name="dump.jsonl"):
+        path = self.directory / name
+        lines = [json.dumps(record) for record in self.records]
+        if name.endswith(".gz"):
+            # the tab separated layout of the Open Library dumps
+            lines = [
+                "\t".join(
+                    [
+                        (
+                            record["type"]
+                            if isinstance(record["type"], str)
+                            else record["type"]["key"]
+                        ),
+                        record["key"],
+                        "1",
+                        "2024-01-01",
+                        line,
+                    ]
+                )
+                for record, line in zip(self.records, lines)
+            ]
+            with gzip.open(path, "wt", encoding="utf-8") as dump:
+                dump.write("\n".join(lines))
+        else:
+            path.write_text("\n".join(lines), encoding="utf-8")
+        return path
+
+    def test_normalize_isbn(self):
+        self.assertEqual(catalog.normalize_isbn("0-441-17271-7"), "9780441172719")
+        self.assertEqual(catalog.normalize_isbn("080442957X"), "9780804429573")
+        self.assertIsNone(catalog.normalize_isbn("0-441-17271-8"))
+        self.assertIsNone(catalog.normalize_isbn("9780441172710"))
+
+    def test_import_counts_only_new_rows(self):
+        created = catalog.CatalogImport(self.dump()).run()
+        # the author exists already, E2 is E1 under its ISBN-13
+        self.assertEqual(created, {"authors": 1, "books": 2, "editions": 2})
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Edition.objects.count(), 2)
+        dune = Book.objects.get(title="Dune")
+        self.assertEqual(dune.publish_year, 1965)
+        self.assertEqual(
+            [genre.name for genre in dune.genres.all()], ["science fiction"]
+        )
+        edition = dune.editions.get()
+        self.assertEqual((edition.isbn, edition.page_count), ("9780441172719", 412))
+        audio = Edition.objects.get(title__title="The Dispossessed")
+        self.assertEqual((audio.format, audio.language), ("A", "eng"))
+        self.assertEqual(search.search("edition", "dispossessed"), [audio.pk])
+
+        again = catalog.CatalogImport(self.dump("dump.tsv.gz")).run()
+        self.assertEqual(again, {"authors": 0, "books": 0, "editions": 0})
+        self.assertEqual(Edition.objects.count(), 2)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("import_catalog", str(self.dump()), batch_size=2, stdout=out)
+        self.assertIn(
+            "Imported 1 author(s), 2 book(s) and 2 edition(s)", out.getvalue()
+        )
+        with self.assertRaises(CommandError):
+            call_command("import_catalog", str(self.directory / "missing.jsonl"))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ReadingLogExportTests(TestCase):
+    def setUp(self):
+        reading = Reading.objects.create(
+            edition=create_edition(title="Dune", author="Frank Herbert", page_count=400)
+        )
+        for day, pages in ((2, 40), (1, 10)):
+            ReadingLog.objects.create(
+                reading=reading, date=moment(2024, 3, day), pages_read=pages
+            )
+
+    def test_streams_every_log_in_date_order(self):
+        response = self.client.get(reverse("read:export-reading-logs"))
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.is_async)
+        self.assertEqual(
+            response["Content-Disposition"],
+            'attachment; filename="reading_logs.csv"',
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(views.EXPORT_COLUMNS))
+        self.assertEqual(
+            [line.split(",")[:5] for line in lines[1:]],
+            [
+                ["2024-03-01 12:00:00+00:00", "Dune", "Frank Herbert", "P", "10"],
+                ["2024-03-02 12:00:00+00:00", "Dune", "Frank Herbert", "P", "40"],
+            ],
+        )
+
+    async def test_streams_asynchronously_under_asgi(self):
+        response = await self.async_client.get(reverse("read:export-reading-logs"))
+        self.assertTrue(response.is_async)
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[2].decode().startswith("2024-03-02 12:00:00+00:00,Dune"))
+
+    def test_rows_are_read_from_the_snapshot(self):
+        with mock.patch("read.routers.snapshot_configured", return_value=True):
+            response = self.client.get(reverse("read:export-reading-logs"))
+        # the routing has ended by the time the body is consumed, the test
+        # mirror cannot be queried next to the default database
+        with mock.patch.object(
+            QuerySet, "iterator", autospec=True, return_value=iter(())
+        ) as iterator:
+            b"".join(response.streaming_content)
+        self.assertEqual(iterator.call_args.args[0].db, "snapshot")
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class WarmUpTests(TestCase):
+    def test_closes_the_connection_it_opened(self):
+        steps = {"database": mock.Mock(), "admin": mock.Mock(side_effect=KeyError)}
+        with (
+            mock.patch.dict(warmup.STEPS, steps, clear=True),
+            mock.patch.object(connection, "close") as close,
+        ):
+            timings = warmup.warm_up()
+        # a failing step does not stop the others or the close
+        self.assertEqual(list(timings), ["database", "admin"])
+        steps["database"].assert_called_once_with()
+        close.assert_called_once_with()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class YearReviewTests(TestCase):
+    def setUp(self):
+        edition = create_edition(title="Dune", author="Frank Herbert", page_count=300)
+        self.reading = Reading.objects.create(
+            edition=edition,
+            current_status="F",
+            date_started=date(2023, 3, 1),
+            date_finished=date(2023, 3, 3),
+            rating=9,
+        )
+        for day, pages in ((1, 100), (2, 200), (3, 300), (9, 300)):
+            ReadingLog.objects.create(
+                reading=self.reading, date=moment(2023, 3, day), pages_read=pages
+            )
+
+    def test_contents(self):
+        data = review.build_data(2023)
+        self.assertEqual(data["pages_read"], 300)
+        self.assertEqual(data["books_finished"], 1)
+        # the last log read nothing new
+        self.assertEqual(data["reading_days"], 3)
+        self.assertEqual(data["longest_streak"], {"days": 3, "start": "2023-03-01"})
+        self.assertEqual(data["fastest_read"]["days"], 3)
+        self.assertEqual(data["top_authors"], [{"name": "Frank Herbert", "pages": 300}])
+        self.assertEqual(data["ratings"], {"9": 1})
+
+    def test_past_years_are_stored_final(self):
+        response = self.client.get(reverse("read:year-review", args=[2023]))
+        self.assertContains(response, "2023 in review")
+        stored = YearInReview.objects.get()
+        self.assertTrue(stored.is_final)
+        self.assertEqual(stored.data["pages_read"], 300)
+        YearInReview.objects.update(generated_at=moment(2024))
+        self.assertEqual(review.year_review(2023).generated_at, moment(2024))
+
+    def test_years_without_readings_are_not_stored(self):
+        current = timezone.localdate().year
+        for year in (2022, current + 1):
+            response = self.client.get(reverse("read:year-review", args=[year]))
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(YearInReview.objects.exists())
+        ReadingLog.objects.all().delete()
+        Reading.objects.all().delete()
+        response = self.client.get(reverse("read:year-review", args=[current]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(READ_TASKS_EAGER=False)
+    def test_current_year_is_rebuilt_once_stale(self):
+        year = timezone.localdate().year
+        report = review.year_review(year)
+        self.assertFalse(report.is_final)
+        self.assertEqual(report.data["pages_read"], 0)
+        reading = Reading.objects.create(edition=create_edition(title="Emma"))
+        ReadingLog.objects.create(
+            reading=reading, date=timezone.now() - timedelta(minutes=1), pages_read=50
+        )
+        # the rebuild job is queued but no worker runs it here
+        self.assertEqual(review.year_review(year).data["pages_read"], 0)
+        YearInReview.objects.update(
+            generated_at=timezone.now() - review.REFRESH - timedelta(minutes=1)
+        )
+        report = review.year_review(year)
+        self.assertFalse(report.is_final)
+        self.assertEqual(report.data["pages_read"], 50)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RecommendationTests(TestCase):
+    def setUp(self):
+        science_fiction = Genre.objects.create(name="science fiction")
+        romance = Genre.objects.create(name="romance")
+        dune = create_edition(title="Dune", author="Frank Herbert", status="F")
+        series = Series.objects.create(title="Dune", author=dune.title.author)
+        Book.objects.filter(pk=dune.title_id).update(series=series)
+        dune.title.genres.add(science_fiction)
+        emma = create_edition(title="Emma", author="Jane Austen", status="F")
+        emma.title.genres.add(romance)
+        Reading.objects.create(edition=dune, current_status="F", rating=10)
+        # only a little below neutral, so mixed books still rank
+        Reading.objects.create(edition=emma, current_status="F", rating=4)
+
+        self.children = create_edition(
+            title="Children of Dune", author="Brian Herbert", status="W"
+        )
+        Book.objects.filter(pk=self.children.title_id).update(series=series)
+        self.foundation = create_edition(
+            title="Foundation", author="Isaac Asimov", status="W"
+        )
+        self.foundation.title.genres.add(science_fiction)
+        self.hyperion = create_edition(
+            title="Hyperion", author="Dan Simmons", status="W"
+        )
+        self.hyperion.title.genres.add(science_fiction, romance)
+        persuasion = create_edition(
+            title="Persuasion", author="Jane Austen", status="W"
+        )
+        persuasion.title.genres.add(romance)
+        # on the list but also being read already
+        started = create_edition(
+            title="Heretics of Dune", author="Frank Herbert", status="W"
+        )
+        Edition.objects.create(title=started.title, format="E", status="P")
+        Book.objects.filter(pk=started.title_id).update(series=series)
+
+    def test_ranking(self):
+        self.assertEqual(recommendations.refresh(), 3)
+        self.assertEqual(
+            [r.edition for r in Recommendation.objects.all()],
+            [self.children, self.foundation, self.hyperion],
+        )
+        scores = list(Recommendation.objects.values_list("score", flat=True))
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(recommendations.refresh(size=1), 1)
+        self.assertEqual(Recommendation.objects.get().edition, self.children)
+
+    def test_no_ratings_no_recommendations(self):
+        Reading.objects.update(rating=None)
+        self.assertEqual(recommendations.rank(), [])
+
+    def test_recommended_in_one_query(self):
+        recommendations.refresh()
+        Edition.objects.filter(pk=self.foundation.pk).update(status="P")
+        with self.assertNumQueries(1):
+            titles = [
+                (r.edition.title.title, r.edition.title.author.name)
+                for r in recommendations.recommended()
+            ]
+        self.assertEqual(
+            titles, [("Children of Dune", "Brian Herbert"), ("Hyperion", "Dan Simmons")]
+        )
+        response = self.client.get(reverse("read:read"))
+        self.assertContains(response, "Children of Dune")
+
+    @override_settings(READ_TASKS_EAGER=False)
+    def test_refresh_is_queued_once_per_taste_change(self):
+        Job.objects.all().delete()
+        reading = Reading.objects.create(edition=self.foundation)
+        reading.date_started = date(2024, 1, 1)
+        reading.save()
+        self.assertFalse(Job.objects.exists())
+        reading.current_status = "F"
+        reading.rating = 8
+        reading.save()
+        reading.rating = 9
+        reading.save()
+        job = Job.objects.get()
+        self.assertEqual(job.key, "refresh_recommendations")
+        reading.delete()
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("refresh_recommendations", top=2, stdout=out)
+        self.assertIn("Stored 2 recommendation(s)", out.getvalue())
+        self.assertEqual(Recommendation.objects.count(), 2)
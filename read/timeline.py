@@ -0,0 +1,83 @@
+"""Progress timeline of a reading, downsampled with Largest-Triangle-Three-Buckets.
+
+LTTB keeps the first and last points and, for every bucket in between, the
+point forming the largest triangle with the previously kept point and the
+average of the next bucket. Only two buckets are held in memory at a time,
+so the logs can be streamed straight from the database cursor.
+"""
+
+from read.models import ReadingLog
+
+DEFAULT_POINTS = 200
+MAX_POINTS = 5000
+
+
+def reading_timeline(reading, points=DEFAULT_POINTS):
+    logs = ReadingLog.objects.filter(reading=reading).order_by("date")
+    count = logs.count()
+    series = (
+        (date.timestamp(), pages, date)
+        for date, pages in logs.values_list("date", "computed_pages").iterator(
+            chunk_size=2000
+        )
+    )
+    return [
+        {"date": date.isoformat(), "value": pages}
+        for _, pages, date in downsample(series, count, points)
+    ]
+
+
+def downsample(points, count, threshold):
+    """Yield at most ``threshold`` of the ``count`` (x, y, ...) points, in order"""
+    if threshold >= count or threshold < 3:
+        yield from points
+        return
+
+    every = (count - 2) / (threshold - 2)
+    last_bucket = threshold - 3
+    points = iter(points)
+    selected = next(points)
+    yield selected
+
+    pending = None  # full bucket waiting for the average of its successor
+    current = []
+    bucket = 0
+    bucket_end = int(every) + 1
+    previous = None
+    index = 0
+    for point in points:
+        if previous is not None:
+            index += 1
+            if index >= bucket_end and bucket < last_bucket:
+                if pending is not None:
+                    selected = _largest_triangle(pending, selected, _average(current))
+                    yield selected
+                pending, current = current, []
+                bucket += 1
+                bucket_end = int((bucket + 1) * every) + 1
+            current.append(previous)
+        previous = point
+
+    if pending is not None:
+        selected = _largest_triangle(pending, selected, _average(current))
+        yield selected
+    if current:
+        yield _largest_triangle(current, selected, previous)
+    if previous is not None:
+        yield previous
+
+
+def _average(bucket):
+    return (
+        sum(point[0] for point in bucket) / len(bucket),
+        sum(point[1] for point in bucket) / len(bucket),
+    )
+
+
+def _largest_triangle(bucket, a, c):
+    ax, ay = a[0], a[1]
+    cx, cy = c[0], c[1]
+    return max(
+        bucket,
+        key=lambda b: abs((ax - cx) * (b[1] - ay) - (ax - b[0]) * (cy - ay)),
+    )
@@ -1,6 +1,21 @@
 from django.urls import path
 
-from .views import MainReadView, AddReadingLogView, daily_logs
+from .views import (
+    MainReadView,
+    AddReadingLogView,
+    analytics_pages_per_genre,
+    analytics_reading_speed,
+    analytics_series_finish_rate,
+    currently_reading_feed,
+    daily_logs,
+    export_reading_logs,
+    last_finished_feed,
+    leaderboard,
+    reading_timeline_view,
+    search_books,
+    want_to_read_feed,
+    year_in_review,
+)
 
 app_name = "read"
 urlpatterns = [
@@ -10,5 +25,40 @@ urlpatterns = [
         AddReadingLogView.as_view(),
         name="add_reading_log",
     ),
-    path("api/read/daily-logs/", daily_logs,name="daily-logs")
+    path("read/year/<int:year>/", year_in_review, name="year-review"),
+    path("api/read/daily-logs/", daily_logs, name="daily-logs"),
+    path(
+        "api/read/readings/<int:reading_id>/timeline/",
+        reading_timeline_view,
+        name="reading-timeline",
+    ),
+    path(
+        "read/feeds/currently-reading/",
+        currently_reading_feed,
+        name="currently-reading-feed",
+    ),
+    path("read/feeds/last-finished/", last_finished_feed, name="last-finished-feed"),
+    path("read/feeds/want-to-read/", want_to_read_feed, name="want-to-read-feed"),
+    path(
+        "api/read/export/reading-logs.csv",
+        export_reading_logs,
+        name="export-reading-logs",
+    ),
+    path("api/read/leaderboard/", leaderboard, name="leaderboard"),
+    path("api/read/search/", search_books, name="search"),
+    path(
+        "api/read/analytics/pages-per-genre/",
+        analytics_pages_per_genre,
+        name="analytics-pages-per-genre",
+    ),
+    path(
+        "api/read/analytics/speed/<str:dimension>/",
+        analytics_reading_speed,
+        name="analytics-speed",
+    ),
+    path(
+        "api/read/analytics/series-finish-rate/",
+        analytics_series_finish_rate,
+        name="analytics-series-finish-rate",
+    ),
 ]
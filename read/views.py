@@ -1,27 +1,97 @@
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, render
+import csv
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
 from django.db.models.functions import TruncDate
 from django.views import View
 from django.db.models import Sum
+from django.utils import timezone
 
-from read.models import Reading, ReadingLog
+from read import analytics, feeds, recommendations, review, search
+from read.leaderboards import rated_books
+from read.models import Book, Reading, ReadingGoal, ReadingLog, YearlyProgress
+from read.pace import reading_paces
+from read.routers import reads_from_snapshot
+from read.timeline import DEFAULT_POINTS, MAX_POINTS, reading_timeline
 
 
 # Create your views here.
 def MainReadView(request):
-    currently_reading: Reading = Reading.objects.filter(current_status="R")
+    currently_reading, currently_reading_cursor = feeds.currently_reading()
+    add_paces(currently_reading)
+    last_finished, last_finished_cursor = feeds.last_finished()
+    recommended = recommendations.recommended()
+    # without ratings to rank by, the box lists the whole want to read list
+    want_to_read, want_to_read_cursor = (
+        ([], None) if recommended else feeds.want_to_read()
+    )
+    year = timezone.localdate().year
+    goal = ReadingGoal.objects.filter(year=year).first()
+    progress = YearlyProgress.objects.filter(year=year).first() or YearlyProgress(
+        year=year
+    )
     return render(
         request,
         "read/main_read_page.html",
         {
             "currently_reading": currently_reading,
+            "currently_reading_cursor": currently_reading_cursor,
+            "last_finished": last_finished,
+            "last_finished_cursor": last_finished_cursor,
+            "recommended": recommended,
+            "want_to_read": want_to_read,
+            "want_to_read_cursor": want_to_read_cursor,
+            "goal": goal,
+            "progress": progress,
+            "pace": goal.required_pace(progress) if goal else None,
+            "top_rated": rated_books(),
+            "worst_rated": rated_books(worst=True),
         },
     )
 
 
-def daily_logs(request):
-    """Provides JSON data for the heatmap"""
-    daily_totals = (
+def add_paces(readings):
+    paces = reading_paces(readings)
+    for reading in readings:
+        reading.pace = paces[reading.id]
+
+
+def currently_reading_feed(request):
+    """Next page of the currently reading cards, loaded on scroll"""
+    readings, cursor = feeds.currently_reading(request.GET.get("cursor"))
+    add_paces(readings)
+    return render(
+        request,
+        "read/partials/currently_reading_feed.html",
+        {"currently_reading": readings, "currently_reading_cursor": cursor},
+    )
+
+
+def last_finished_feed(request):
+    """Next page of the finished readings, loaded on scroll"""
+    readings, cursor = feeds.last_finished(request.GET.get("cursor"))
+    return render(
+        request,
+        "read/partials/last_finished_feed.html",
+        {"last_finished": readings, "last_finished_cursor": cursor},
+    )
+
+
+def want_to_read_feed(request):
+    """Next page of the editions marked as want to read, loaded on scroll"""
+    editions, cursor = feeds.want_to_read(request.GET.get("cursor"))
+    return render(
+        request,
+        "read/partials/want_to_read_feed.html",
+        {"want_to_read": editions, "want_to_read_cursor": cursor},
+    )
+
+
+def daily_totals():
+    """Pages read per day, answered from read_readinglog_progress_idx"""
+    return (
         ReadingLog.objects.filter(page_difference__gt=0)
         .annotate(date_trunc=TruncDate("date"))
         .values("date_trunc")
@@ -29,13 +99,176 @@ def daily_logs(request):
         .order_by("date_trunc")
     )
 
+
+@reads_from_snapshot
+async def daily_logs(request):
+    """Provides JSON data for the heatmap"""
     data = [
         {"date": entry["date_trunc"].isoformat(), "value": entry["total"]}
-        for entry in daily_totals
+        async for entry in daily_totals()
     ]
     return JsonResponse(data, safe=False)
 
 
+@reads_from_snapshot
+async def analytics_pages_per_genre(request):
+    """Pages read per genre and month"""
+    data = await sync_to_async(analytics.pages_per_genre_per_month)()
+    return JsonResponse(data, safe=False)
+
+
+@reads_from_snapshot
+async def analytics_reading_speed(request, dimension):
+    """Pages per reading day by edition format, language or author"""
+    if dimension not in analytics.SPEED_DIMENSIONS:
+        return JsonResponse(
+            {
+                "success": False,
+                "errors": f"dimension must be one of {', '.join(analytics.SPEED_DIMENSIONS)}",
+            },
+            status=400,
+        )
+    data = await sync_to_async(analytics.reading_speed)(dimension)
+    return JsonResponse(data, safe=False)
+
+
+@reads_from_snapshot
+async def analytics_series_finish_rate(request):
+    """Share of started readings that were finished, per series"""
+    data = await sync_to_async(analytics.series_finish_rate)()
+    return JsonResponse(data, safe=False)
+
+
+async def leaderboard(request):
+    """Top or worst rated books, optionally filtered by genre, author or year"""
+    try:
+        limit = int(request.GET.get("limit", 10))
+        filters = {
+            name: int(request.GET[name])
+            for name in ("genre", "author", "year")
+            if request.GET.get(name)
+        }
+    except ValueError:
+        return JsonResponse(
+            {
+                "success": False,
+                "errors": "limit, genre, author and year must be numbers",
+            },
+            status=400,
+        )
+    if limit < 1:
+        return JsonResponse(
+            {"success": False, "errors": "limit must be at least 1"}, status=400
+        )
+    books = rated_books(
+        worst=request.GET.get("order") == "worst", limit=min(limit, 100), **filters
+    )
+    data = [
+        {
+            "id": book.id,
+            "title": book.title,
+            "author": book.author.name,
+            "rating": book.average_rating,
+            "ratings": book.rating_count,
+        }
+        async for book in books
+    ]
+    return JsonResponse(data, safe=False)
+
+
+async def search_books(request):
+    """Prefix search over book titles, authors, series, subtitles and ISBNs"""
+    ids = await sync_to_async(search.search)("book", request.GET.get("q", ""))
+    books = await Book.objects.select_related("author", "series").ain_bulk(ids)
+    data = [
+        {
+            "id": book.id,
+            "title": book.title,
+            "author": book.author.name,
+            "series": book.series.title if book.series else None,
+        }
+        for book in (books[pk] for pk in ids if pk in books)
+    ]
+    return JsonResponse(data, safe=False)
+
+
+async def reading_timeline_view(request, reading_id):
+    """Provides the downsampled progress curve of a reading for charts"""
+    reading = await aget_object_or_404(Reading, id=reading_id)
+    try:
+        points = int(request.GET.get("points", DEFAULT_POINTS))
+    except ValueError:
+        points = 0
+    if not 3 <= points <= MAX_POINTS:
+        return JsonResponse(
+            {
+                "success": False,
+                "errors": f"points must be between 3 and {MAX_POINTS}",
+            },
+            status=400,
+        )
+    data = await sync_to_async(reading_timeline)(reading, points)
+    return JsonResponse(data, safe=False)
+
+
+def year_in_review(request, year):
+    """Stored report of a year, built the first time it is asked for"""
+    # only the years with readings get a report stored
+    first = review.first_year()
+    if first is None or not first <= year <= timezone.localdate().year:
+        raise Http404("Nothing was read that year")
+    return render(
+        request, "read/year_review.html", {"review": review.year_review(year)}
+    )
+
+
+class Echo:
+    """File-like object handing back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+EXPORT_COLUMNS = {
+    "date": "date",
+    "book": "reading__edition__title__title",
+    "author": "reading__edition__title__author__name",
+    "format": "reading__edition__format",
+    "pages_read": "pages_read",
+    "percentage_read": "percentage_read",
+    "computed_pages": "computed_pages",
+    "page_difference": "page_difference",
+}
+
+
+@reads_from_snapshot
+def export_reading_logs(request):
+    """Streams every reading log as CSV without loading them all in memory"""
+    logs = ReadingLog.objects.order_by("date", "id").values(*EXPORT_COLUMNS.values())
+    # the rows are read after the view has returned, outside snapshot_reads(),
+    # so pin the database the router picks for it now
+    logs = logs.using(logs.db)
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(EXPORT_COLUMNS)
+        for log in logs.iterator(chunk_size=2000):
+            yield writer.writerow(log.values())
+
+    async def arows():
+        yield writer.writerow(EXPORT_COLUMNS)
+        async for log in logs.aiterator(chunk_size=2000):
+            yield writer.writerow(log.values())
+
+    # each handler streams only its own kind of iterator, ASGI would collect
+    # the sync one and WSGI the async one before sending anything
+    return StreamingHttpResponse(
+        arows() if isinstance(request, ASGIRequest) else rows(),
+        content_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="reading_logs.csv"'},
+    )
+
+
 class AddReadingLogView(View):
     def get(self, request, reading_id):
         reading = get_object_or_404(Reading, id=reading_id)
@@ -0,0 +1,107 @@
+"""Pay the first-request costs of a fresh worker before it takes traffic.
+
+Enabled by setting MEDIA_LOG_WARMUP in the environment of media_log/wsgi.py.
+Every step is optional: a failure is logged and the worker starts anyway.
+The connection is closed at the end: under gunicorn --preload the warm-up
+runs before the fork and the workers must not share its socket or file.
+"""
+
+import logging
+from pathlib import Path
+from time import perf_counter
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.db import connection
+from django.template import engines
+from django.test import RequestFactory
+from django.urls import get_resolver, reverse
+from django.urls.converters import IntConverter
+
+logger = logging.getLogger(__name__)
+
+
+def template_names():
+    """Names of the project templates and of the templates of the read app"""
+    directories = [Path(directory) for directory in settings.TEMPLATES[0]["DIRS"]]
+    directories.append(Path(apps.get_app_config("read").path) / "templates")
+    for directory in directories:
+        for path in sorted(directory.rglob("*.html")):
+            yield path.relative_to(directory).as_posix()
+
+
+def load_templates():
+    """Parse the templates into the cached loader"""
+    engine = engines["django"]
+    for name in template_names():
+        engine.get_template(name)
+
+
+def reverse_urls():
+    """Build the resolver and reverse every read: URL once"""
+    resolver = get_resolver()
+    resolver.resolve("/read/")
+    namespace = resolver.namespace_dict["read"][1]
+    for pattern in namespace.url_patterns:
+        kwargs = {
+            name: 1 if isinstance(converter, IntConverter) else "warmup"
+            for name, converter in pattern.pattern.converters.items()
+        }
+        reverse(f"read:{pattern.name}", kwargs=kwargs)
+
+
+def open_database():
+    """Connect, and on SQLite load the schema and refresh the planner stats"""
+    connection.ensure_connection()
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("SELECT count(*) FROM sqlite_master")
+            cursor.execute("PRAGMA optimize")
+        else:
+            cursor.execute("SELECT 1")
+
+
+def load_admin():
+    """Compute the model metadata and the admin URLs"""
+    for model in apps.get_models():
+        model._meta.get_fields()
+    for model_admin in admin.site._registry.values():
+        model_admin.urls
+
+
+def render_dashboard():
+    """Render the dashboard once, which fills the pace cache"""
+    from read.views import MainReadView
+
+    request = RequestFactory().get(reverse("read:read"), HTTP_HOST="localhost")
+    MainReadView(request)
+
+
+STEPS = {
+    "templates": load_templates,
+    "urls": reverse_urls,
+    "database": open_database,
+    "admin": load_admin,
+    "dashboard": render_dashboard,
+}
+
+
+def warm_up():
+    """Run every step, return the seconds each took"""
+    timings = {}
+    for name, step in STEPS.items():
+        start = perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.warning("Warm-up step %s failed", name, exc_info=True)
+        timings[name] = perf_counter() - start
+    connection.close()
+    logger.info(
+        "Warm-up done: %s",
+        ", ".join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()
+        ),
+    )
+    return timings